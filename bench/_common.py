@@ -0,0 +1,67 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"Helpers shared by the benchmarks"
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import os
+import sys
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from umansysprop import results
+
+
+def make_result(rows, cols):
+    """
+    Returns a :class:`~umansysprop.results.Result` containing a single table
+    of *rows* x *cols* floating point values. The values are calculated up
+    front so that timings cover rendering (or encoding) alone.
+    """
+    result = results.Result(
+        results.Table(
+            'values', [float(r) for r in range(rows)], list(range(cols)),
+            func=lambda r, c: r * c + 0.1,
+            rows_title='row', cols_title='col'),
+        )
+    result[0].data
+    return result
+
+
+def best_of(repeat, func, *args):
+    """
+    Calls *func* with *args* *repeat* times, returning a tuple of the
+    shortest time taken by a call, and the output of the last call.
+    """
+    best = None
+    for i in range(repeat):
+        start = timer()
+        output = func(*args)
+        elapsed = timer() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
@@ -0,0 +1,139 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark for the client library against a local server.
+
+Makes COUNT sequential calls through :class:`umansysprop.client.UManSysProp`
+and reports the call rate. By default the calls go to a stand-in for the JSON
+API started in-process on a local port; it renders its results with the
+server's own renderers but performs no chemistry, so the figures reflect the
+client, HTTP and serialization overheads alone. To benchmark a real server
+instead, pass its address with ``--url`` along with the name of the method to
+call and its parameters as JSON::
+
+    python bench/client_calls.py --count 1000
+    python bench/client_calls.py --url http://localhost:8000/ \\
+        --method test --params '{"temperatures": [10, 20], "scale1": 2,
+        "scale2": 3, "compounds": ["C(=O)(C(=O)O)O"]}'
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import os
+import sys
+import json
+import argparse
+import threading
+from timeit import default_timer as timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from flask import Flask, request, jsonify
+from werkzeug.serving import make_server, WSGIRequestHandler
+
+from umansysprop import renderers, results
+from umansysprop.client import UManSysProp
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route('/api')
+    def api():
+        return jsonify(scale={
+            'url': '/api/scale',
+            'title': 'Scale',
+            'doc': 'Multiplies each temperature by factor',
+            'params': ['temperatures', 'factor'],
+            'lists': {},
+            })
+
+    @app.route('/api/scale', methods=['POST'])
+    def scale():
+        args = json.loads(request.get_data(as_text=True))
+        result = results.Result(
+            results.Table(
+                'scaled', args['temperatures'], ['value'],
+                func=lambda t, c: t * args['factor'],
+                rows_title='Temperature', rows_unit='K'),
+            )
+        mimetype = 'application/json'
+        headers, body = renderers.render(mimetype, result)
+        response = app.response_class(body, mimetype=mimetype)
+        response.headers.extend(headers)
+        return response
+
+    return app
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_server():
+    server = make_server(
+        '127.0.0.1', 0, make_app(), threaded=True,
+        request_handler=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:%d/' % server.server_port
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--method', default='scale')
+    parser.add_argument(
+        '--params', type=json.loads,
+        default={'temperatures': [298.15, 308.15, 318.15], 'factor': 2.0})
+    parser.add_argument('--count', type=int, default=1000)
+    args = parser.parse_args(args)
+
+    server = None
+    if args.url is None:
+        server, args.url = start_server()
+    try:
+        with UManSysProp(args.url, cache_manifest=False) as client:
+            method = getattr(client, args.method)
+            # Warm up the connection pool before timing
+            method(**args.params)
+            start = timer()
+            for i in range(args.count):
+                method(**args.params)
+            elapsed = timer() - start
+        print('%d calls to %s: %.2fs (%.0f calls/s)' % (
+            args.count, args.method, elapsed, args.count / elapsed))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
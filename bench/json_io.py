@@ -0,0 +1,77 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark for the JSON backends.
+
+Encodes a table of ROWS x COLS calculated values (a million by default)
+with :func:`umansysprop.renderers.render_json` and decodes the document with
+:meth:`umansysprop.results.Result.from_json`, once for each JSON library
+available to :mod:`umansysprop.jsonio`, reporting the best of several runs.
+Run from the root of the source tree::
+
+    python bench/json_io.py --rows 1000 --cols 1000
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import argparse
+
+from _common import make_result, best_of
+from umansysprop import renderers, results, jsonio
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(args)
+
+    result = make_result(args.rows, args.cols)
+    values = args.rows * args.cols
+    default = jsonio.backend()
+    try:
+        for name in jsonio._BACKENDS:
+            jsonio.set_backend(name)
+            encode, body = best_of(
+                args.repeat, renderers.render_json, result)
+            decode, decoded = best_of(
+                args.repeat, results.Result.from_json, body)
+            assert decoded[0].as_ndarray.shape == (args.rows, args.cols)
+            print(
+                '%-7s encode %.2fs (%.2fM values/s)  '
+                'decode %.2fs (%.2fM values/s)  %d bytes%s' % (
+                    name, encode, values / encode / 1e6,
+                    decode, values / decode / 1e6, len(body),
+                    ' (default)' if name == default else ''))
+    finally:
+        jsonio.set_backend(default)
+
+
+if __name__ == '__main__':
+    main()
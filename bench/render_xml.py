@@ -0,0 +1,105 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark for the streaming XML renderer.
+
+Renders a table of ROWS x COLS calculated cells with
+:func:`umansysprop.renderers.render_xml`, and with a copy of the
+:class:`~umansysprop.html.TagFactory` tree renderer it replaced, reporting
+the best of several runs of each along with the size of the documents
+produced. Run from the root of the source tree::
+
+    python bench/render_xml.py --rows 1000 --cols 100
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import argparse
+
+from _common import make_result, best_of
+from umansysprop import renderers
+from umansysprop.html import TagFactory
+
+
+def render_xml_tree(results, **kwargs):
+    # The renderer replaced by render_xml, which builds the entire document
+    # as nested strings with TagFactory
+    tag = TagFactory(xml=True)
+
+    def render_table(table):
+        return tag.table(
+            tag.cols(
+                tag.dim(title=title, unit=unit)
+                for (title, unit) in zip(table.col_titles, table.col_units)
+                ),
+            tag.rows(
+                tag.dim(title=title, unit=unit)
+                for (title, unit) in zip(table.row_titles, table.row_units)
+                ),
+            tag.data(
+                tag.datum(
+                    tag.row(tag.dim(key=key) for key in row_key),
+                    tag.col(tag.dim(key=key) for key in col_key),
+                    value
+                    )
+                for row_key, col_key, value in table.data_iter
+                ),
+            title=table.title,
+            name=table.name,
+            )
+
+    return tag.tables(render_table(table) for table in results)
+
+
+def render_xml(results):
+    output = renderers.render_xml(results)
+    if not isinstance(output, str):
+        output = ''.join(output)
+    return output
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(args)
+
+    result = make_result(args.rows, args.cols)
+    cells = args.rows * args.cols
+    for name, func in (
+            ('tag tree', render_xml_tree),
+            ('streaming', render_xml),
+            ):
+        best, output = best_of(args.repeat, func, result)
+        print('%-9s %d cells: best %.3fs of %d (%.0f cells/s), %d bytes' % (
+            name, cells, best, args.repeat, cells / best, len(output)))
+
+
+if __name__ == '__main__':
+    main()
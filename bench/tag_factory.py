@@ -0,0 +1,162 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Benchmark for the HTML TagFactory.
+
+Times :func:`umansysprop.renderers.render_html` on a table of ROWS x COLS
+calculated cells, and the construction of COUNT nested widget-style
+fragments (the pattern the form widgets use), with
+:class:`umansysprop.html.TagFactory` and with a copy of the TagFactory it
+replaced. Run from the root of the source tree::
+
+    python bench/tag_factory.py --rows 1000 --cols 100 --count 20000
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import argparse
+
+from _common import make_result, best_of
+from umansysprop import renderers, html
+
+
+class content(str):
+    # The escaping of the replaced TagFactory, with a pass per character
+    def __html__(self):
+        return html.literal(self.\
+                replace('&', '&amp;').\
+                replace('"', '&quot;').\
+                replace('<', '&lt;').\
+                replace('>', '&gt;'))
+
+
+def escaped(s):
+    if hasattr(s, '__html__'):
+        return s.__html__()
+    else:
+        return content(s).__html__()
+
+
+class BaselineTagFactory(object):
+    # The TagFactory replaced by html.TagFactory, which concatenates strings
+    # and formats nested content recursively as separate strings
+    def __init__(self, xml=False):
+        self._xml = xml
+
+    def _format(self, content):
+        if isinstance(content, str):
+            return escaped(content)
+        elif isinstance(content, bytes):
+            return escaped(content.decode('utf-8'))
+        else:
+            try:
+                return html.literal(''.join(self._format(item) for item in content))
+            except TypeError:
+                return escaped(content)
+
+    def _generate(self, _tag, *args, **kwargs):
+        _tag = _tag.rstrip('_')
+        result = ''
+        open_tag = kwargs.get('_open', True)
+        close_tag = kwargs.get('_close', self._xml or _tag.lower() not in html.EMPTY_ELEMENTS)
+        empty_tag = not args
+        if open_tag:
+            if empty_tag and not close_tag and self._xml:
+                template = '<%s%s/>'
+            else:
+                template = '<%s%s>'
+            result += template % (
+                _tag,
+                ''.join(
+                    ' %s="%s"' % (
+                        k, k if v is True else content(v).__html__()
+                        )
+                    for (_k, v) in kwargs.items()
+                    for k in (_k.rstrip('_').replace('_', '-'),)
+                    if v is not None
+                    and v is not False)
+                )
+            for arg in args:
+                result += self._format(arg)
+        if close_tag:
+            result += '</%s>' % _tag
+        return html.literal(result)
+
+    def __getattr__(self, attr):
+        def generator(*args, **kwargs):
+            return self._generate(attr, *args, **kwargs)
+        setattr(self, attr, generator)
+        return generator
+
+
+def widgets(factory, count):
+    tag = factory()
+    for i in range(count):
+        tag.div(
+            tag.div(
+                tag.a(
+                    'Remove <row>', class_='button radius tiny right',
+                    data_toggle='fieldset-remove-row'),
+                class_='medium-2 small-3 columns clearfix'),
+            class_='row', data_toggle='fieldset-entry')
+
+
+def render_html(factory, result):
+    # render_html constructs its factory by name, so swap the factory in for
+    # the duration of the call
+    saved = renderers.TagFactory
+    renderers.TagFactory = factory
+    try:
+        return renderers.render_html(result)
+    finally:
+        renderers.TagFactory = saved
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--cols', type=int, default=100)
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(args)
+
+    result = make_result(args.rows, args.cols)
+    for name, factory in (
+            ('baseline', BaselineTagFactory),
+            ('current', html.TagFactory),
+            ):
+        best, output = best_of(args.repeat, render_html, factory, result)
+        print('%-8s render_html %d cells: best %.3fs of %d, %d bytes' % (
+            name, args.rows * args.cols, best, args.repeat, len(output)))
+        best, output = best_of(args.repeat, widgets, factory, args.count)
+        print('%-8s widget fragments x%d: best %.3fs of %d' % (
+            name, args.count, best, args.repeat))
+
+
+if __name__ == '__main__':
+    main()
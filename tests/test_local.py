@@ -0,0 +1,56 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import pytest
+
+from umansysprop.local import LocalUManSysProp
+
+
+def test_local_params():
+    # Methods take the parameters of the tool's form, in order, like those of
+    # the remote client
+    with LocalUManSysProp() as client:
+        code = client.test.__func__.__code__
+        assert code.co_varnames[1:code.co_argcount] == (
+            'temperatures', 'scale1', 'scale2', 'compounds')
+
+
+def test_local_call():
+    with LocalUManSysProp() as client:
+        result = client.test(
+            temperatures=[10.0, 20.0], scale1=2, scale2=3,
+            compounds=['C(=O)(C(=O)O)O'])
+    assert [table.name for table in result] == ['temps', 'formulae']
+    assert result.temps.as_ndarray.tolist() == [[20.0, 30.0], [40.0, 60.0]]
+    assert result.formulae.data[(result.formulae.rows[0], 'Formula')] == 'C2H2O4'
+
+
+def test_local_call_missing_param():
+    with LocalUManSysProp() as client:
+        with pytest.raises(TypeError):
+            client.test(temperatures=[10.0], scale1=2, scale2=3)
@@ -43,9 +43,14 @@ __requires__ = [
     ]
 
 __extra_requires__ = {
-    'server': ['openbabel', 'flask', 'flask-wtf', 'wtforms', 'docutils', 'xlsxwriter'],
+    'server': ['openbabel', 'flask', 'flask-wtf', 'wtforms', 'docutils', 'xlsxwriter', 'numpy'],
     'client': [],
+    'async':  ['aiohttp'],
+    'arrow':  ['pyarrow'],
+    'json':   ['ujson'],
+    'orjson': ['orjson'],
     'doc':    ['sphinx'],
+    'test':   ['pytest', 'coverage'],
     }
 
 if sys.version_info[:2] == (3, 2):
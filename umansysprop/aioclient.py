@@ -0,0 +1,225 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+================================
+``umansysprop.aioclient`` Module
+================================
+
+This module contains an :mod:`asyncio` variant of the client library for
+interacting with the UManSysProp server, intended for submitting large numbers
+of concurrent requests from a single process. It requires Python 3.5 or later,
+and the `aiohttp`_ package. Only one user-accessible class is defined in the
+module:
+
+AsyncUManSysProp
+================
+
+.. autoclass:: AsyncUManSysProp
+
+.. _aiohttp: https://aiohttp.readthedocs.io/
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import json
+import asyncio
+from urllib.parse import urljoin
+
+import aiohttp
+
+from .client import (
+    _bind_methods,
+    _raise_error,
+    _error_details,
+    _retry_after,
+    _shard_params,
+    _merge_results,
+    _result_accept,
+    _decode_result,
+    )
+
+
+class AsyncUManSysProp(object):
+    """
+    Provides an :mod:`asyncio` interface to the methods provided via the JSON
+    API on the UManSysProp website. This is the asynchronous equivalent of
+    :class:`~umansysprop.client.UManSysProp`; the methods exposed are
+    identical, but each is a coroutine. The server is queried for the
+    available methods when the client is opened, so the class is normally
+    used as an asynchronous context manager::
+
+        import asyncio
+        from umansysprop.aioclient import AsyncUManSysProp
+
+        async def main(compounds):
+            async with AsyncUManSysProp() as client:
+                return await asyncio.gather(*(
+                    client.vapour_pressure(
+                        [smiles], [298.15], 'nannoolal', 'nannoolal')
+                    for smiles in compounds
+                    ))
+
+    Alternatively, await :meth:`open` after construction, and :meth:`close`
+    when finished. Each method returns a :class:`~umansysprop.results.Result`.
+
+    The *concurrency* parameter (default 100) limits the number of requests
+    that may be in flight at once; further calls wait until an earlier request
+    completes. The *pool_size* parameter (default 100) limits the number of
+    connections kept open to the server. The *retries*, *backoff*,
+    *timeout*, and *shard_size* parameters behave as in
+    :class:`~umansysprop.client.UManSysProp`; chunks of oversized compound
+    lists are sent concurrently, subject to the *concurrency* limit.
+    """
+
+    _method_template = """\
+async def {name}(self, {params}):
+    return await self._json_rpc("{url}", {call})
+"""
+
+    # HTTP status codes indicating a transient failure worth retrying
+    _retry_statuses = frozenset((429, 502, 503, 504))
+
+    # Longest delay honoured from a Retry-After header, if no timeout is set
+    _max_retry_delay = 60.0
+
+    def __init__(self, base_url='http://umansysprop.seaes.manchester.ac.uk/',
+            concurrency=100, pool_size=100, retries=3, backoff=0.5,
+            timeout=None, shard_size=None):
+        self._base_url = base_url
+        self._shard_size = shard_size
+        self._lists = {}
+        self._concurrency = concurrency
+        self._pool_size = pool_size
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._session = None
+        self._semaphore = None
+
+    async def open(self):
+        """
+        Opens the client's connection pool and queries the server for the
+        available methods.
+        """
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self._pool_size),
+            timeout=aiohttp.ClientTimeout(total=self._timeout))
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+        try:
+            status, headers, body = await self._request(
+                'GET', urljoin(self._base_url, 'api'),
+                headers={'Accept': 'application/json'})
+            if status >= 400:
+                raise RuntimeError('Failed to query API: HTTP %d' % status)
+            manifest = json.loads(body.decode('utf-8'))
+            self._lists = {
+                props['url']: props.get('lists', {})
+                for props in manifest.values()
+                }
+            _bind_methods(self, manifest)
+        except:
+            await self.close()
+            raise
+        return self
+
+    async def close(self):
+        """
+        Closes all connections held open by the client.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _request(self, method, url, **kwargs):
+        # As in the synchronous client, all requests can be safely retried.
+        # The concurrency limit only applies to requests in flight, not to
+        # those waiting to retry
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self._session.request(
+                            method, url, **kwargs) as response:
+                        status = response.status
+                        headers = response.headers.copy()
+                        body = await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= self._retries:
+                    raise
+                delay = self._backoff * 2 ** attempt
+            else:
+                if status not in self._retry_statuses or attempt >= self._retries:
+                    return status, headers, body
+                delay = _retry_after(
+                    headers, self._backoff * 2 ** attempt,
+                    self._timeout or self._max_retry_delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _json_rpc(self, url, **params):
+        shards = _shard_params(params, self._lists.get(url, {}), self._shard_size)
+        if len(shards) == 1:
+            return await self._call(url, params)
+        return _merge_results(await asyncio.gather(*(
+            self._call(url, shard) for shard in shards
+            )))
+
+    async def _call(self, url, params):
+        status, headers, body = await self._request(
+                'POST',
+                urljoin(self._base_url, url),
+                data=json.dumps(params),
+                headers={
+                    'Accept': _result_accept(),
+                    'Content-Type': 'application/json',
+                    })
+        if status == 202:
+            # As in the synchronous client, poll a background job's location
+            # until it has finished
+            location = urljoin(self._base_url, headers['Location'])
+            while status == 202:
+                await asyncio.sleep(_retry_after(
+                    headers, self._backoff,
+                    self._timeout or self._max_retry_delay))
+                status, headers, body = await self._request(
+                        'GET', location,
+                        headers={'Accept': _result_accept()})
+        if status >= 400:
+            # As in the synchronous client, errors are reported as JSON
+            # whatever the status
+            details = _error_details(body)
+            if details is not None:
+                _raise_error(details)
+            raise RuntimeError('Server error: HTTP %d: %s' % (
+                status, body.decode('utf-8', 'replace')))
+        return _decode_result(headers.get('Content-Type', ''), body)
@@ -0,0 +1,214 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+============================
+``umansysprop.cache`` Module
+============================
+
+This module contains a persistent cache of results which can be used by the
+client library to avoid repeating calls to the UManSysProp server. Only one
+user-accessible class is defined in the module:
+
+ResultCache
+===========
+
+.. autoclass:: ResultCache
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import os
+import io
+import json
+import zlib
+import errno
+import pickle
+import hashlib
+import tempfile
+
+
+def _default_path():
+    # The directory under the user's cache directory used by default for
+    # results and for the client's copy of the API manifest
+    return os.path.join(
+        os.environ.get(
+            'XDG_CACHE_HOME', os.path.expanduser(os.path.join('~', '.cache'))),
+        'umansysprop')
+
+
+try:
+    _replace = os.replace
+except AttributeError:
+    # Python 2 has no os.replace, and its os.rename fails on Windows if the
+    # destination exists
+    def _replace(src, dst):
+        try:
+            os.rename(src, dst)
+        except OSError:
+            try:
+                os.unlink(dst)
+            except OSError:
+                pass
+            os.rename(src, dst)
+
+
+class ResultCache(object):
+    """
+    A persistent cache of :class:`~umansysprop.results.Result` objects stored
+    on disk. Typically an instance is passed to the *cache* parameter of
+    :class:`~umansysprop.client.UManSysProp`, which will then return results
+    from the cache for calls it has made before::
+
+        >>> from umansysprop.client import UManSysProp
+        >>> from umansysprop.cache import ResultCache
+        >>> client = UManSysProp(cache=ResultCache())
+
+    The *path* parameter specifies the directory in which results are stored.
+    It defaults to ``umansysprop`` under the user's cache directory (usually
+    ``~/.cache``). Each result is stored in its own compressed file. When the
+    total size of the files exceeds *max_size* bytes (default 100Mb), the
+    least recently used results are discarded.
+
+    Results are stored with :mod:`pickle`, and loading a pickle can execute
+    arbitrary code. The cache directory must therefore not be writable by
+    any other user; it is created accessible to its owner only, but if you
+    specify an existing, shared *path*, ensure its permissions are suitably
+    restricted.
+
+    The client includes a hash of the server's API manifest and the version of
+    this package in each key, so updates to the server or client implicitly
+    invalidate prior results. Use :meth:`clear` to discard all results
+    explicitly, or the client's
+    :meth:`~umansysprop.client.UManSysProp.bypass_cache` method to refresh
+    particular results.
+    """
+
+    suffix = '.result'
+
+    def __init__(self, path=None, max_size=100 * 1024 * 1024):
+        if path is None:
+            path = _default_path()
+        self.path = path
+        self.max_size = max_size
+        try:
+            os.makedirs(path, 0o700)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    @staticmethod
+    def key(*args):
+        """
+        Returns a key for the specified *args*, which must be serializable as
+        JSON. Equal *args* always produce the same key, regardless of the
+        ordering of any dicts they contain.
+        """
+        return hashlib.sha256(json.dumps(
+            args, sort_keys=True, separators=(',', ':')
+            ).encode('utf-8')).hexdigest()
+
+    def _filename(self, key):
+        return os.path.join(self.path, key + self.suffix)
+
+    def get(self, key):
+        """
+        Returns the result stored under *key*, or :data:`None` if there is no
+        such result.
+        """
+        filename = self._filename(key)
+        try:
+            with io.open(filename, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        try:
+            result = pickle.loads(zlib.decompress(data))
+        except Exception:
+            # Corrupt or incompatible entries are simply discarded
+            self.discard(key)
+            return None
+        try:
+            # Update the modification time for least recently used eviction
+            os.utime(filename, None)
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """
+        Stores *result* under *key*, discarding the least recently used
+        results if the cache has exceeded its maximum size.
+        """
+        data = zlib.compress(pickle.dumps(result, protocol=2))
+        # Write to a temporary file and rename it so that readers never see
+        # a partially written entry
+        with tempfile.NamedTemporaryFile(
+                dir=self.path, suffix='.tmp', delete=False) as f:
+            f.write(data)
+        _replace(f.name, self._filename(key))
+        self._evict()
+
+    def discard(self, key):
+        """
+        Removes the result stored under *key*, if any.
+        """
+        try:
+            os.unlink(self._filename(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        """
+        Removes all results from the cache.
+        """
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                try:
+                    os.unlink(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.path):
+            if name.endswith(self.suffix):
+                filename = os.path.join(self.path, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        total = sum(size for (mtime, size, filename) in entries)
+        entries.sort()
+        for mtime, size, filename in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+            total -= size
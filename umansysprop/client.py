@@ -41,16 +41,184 @@ from __future__ import (
 str = type('')
 
 
+import os
+import io
+import time
 import types
 import json
+import errno
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
 try:
     from urllib.parse import urljoin
 except ImportError:
     from urlparse import urljoin
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from . import results
+from . import __version__, results
+from .cache import ResultCache, _default_path, _replace
+from .limits import TimeoutError
+
+
+_accept = None
+
+def _result_accept():
+    # The binary result format requires numpy to decode, so only ask for it
+    # when numpy is available. Servers which predate the format will ignore
+    # it and return JSON
+    global _accept
+    if _accept is None:
+        try:
+            import numpy
+        except ImportError:
+            _accept = 'application/json'
+        else:
+            _accept = '%s, application/json;q=0.5' % results._BINARY_MIMETYPE
+    return _accept
+
+
+def _decode_result(content_type, body):
+    # Construct a Result from a response body of the specified type
+    if content_type.split(';')[0].strip() == results._BINARY_MIMETYPE:
+        return results.Result.from_binary(body)
+    return results.Result.from_json(body)
+
+
+def _make_method(obj, name, props):
+    # Construct a dynamic method bound to obj for a function that the API
+    # manifest defines, using obj's _method_template. The method will take the
+    # parameters specified by the API, and will have a doc-string also
+    # specified by the API
+    method_definition = obj._method_template.format(
+            name=name,
+            url=props['url'],
+            params=', '.join(props['params']),
+            call=', '.join(
+                '%s=%s' % (param, param) for param in props['params'])
+            )
+    l = {}
+    exec(method_definition, globals(), l)
+    f = l[name]
+    f.__doc__ = props['doc']
+    return types.MethodType(f, obj)
+
+
+def _bind_methods(obj, manifest):
+    # Construct a dynamic method on obj for each function that the API
+    # manifest defines
+    for name, props in manifest.items():
+        setattr(obj, name, _make_method(obj, name, props))
+
+
+def _raise_error(obj):
+    # Some kind of error; obj is the error response decoded from JSON. Raise a
+    # reasonable exception from the details it contains
+    exc_type = obj['exc_type']
+    exc_value = obj['exc_value']
+    # Only permit a specific set of exceptions
+    try:
+        exc_class = {
+            'ValueError':       ValueError,
+            'NameError':        NameError,
+            'KeyError':         KeyError,
+            'TimeoutError':     TimeoutError,
+            'RuntimeError':     RuntimeError,
+            'Cancelled':        results.Cancelled,
+            'DeadlineExceeded': results.DeadlineExceeded,
+            }[exc_type]
+    except KeyError:
+        raise RuntimeError('Server error: %s: %s' % (exc_type, exc_value))
+    if isinstance(exc_value, str):
+        raise exc_class(exc_value)
+    else:
+        raise exc_class(*exc_value)
+
+
+def _error_details(body):
+    # Return the exception details from the body of an error response, or
+    # None if it doesn't contain any (e.g. an error page from a proxy)
+    try:
+        obj = json.loads(body.decode('utf-8'))
+        obj['exc_type'], obj['exc_value']
+    except (ValueError, KeyError, TypeError, UnicodeDecodeError):
+        return None
+    return obj
+
+
+def _retry_after(headers, default, limit):
+    # Return the delay requested by a Retry-After header (in seconds),
+    # clamped to the range [0, limit], or default if there is none. A bogus
+    # or hostile header must not stall the client indefinitely
+    try:
+        delay = float(headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return default
+    if not delay >= 0:
+        delay = 0.0
+    return min(delay, limit)
+
+
+def _shard_params(params, lists, shard_size=None):
+    # Split the parameters of a call into a list of parameters for several
+    # calls if a compound list parameter is longer than the server permits
+    # (or longer than shard_size, if that is smaller). The lists mapping gives
+    # the server's maximum length for each compound list parameter. Only the
+    # longest such list is split; it is assumed that the tool treats each
+    # compound independently, which is the case for all list parameters
+    candidates = [
+        (len(params[name]), name, limit)
+        for (name, limit) in lists.items()
+        if isinstance(params.get(name), (list, tuple))
+        ]
+    if not candidates:
+        return [params]
+    length, name, limit = max(candidates)
+    if shard_size:
+        limit = min(limit, shard_size)
+    if length <= limit:
+        return [params]
+    return [
+        dict(params, **{name: params[name][start:start + limit]})
+        for start in range(0, length, limit)
+        ]
+
+
+def _merge_results(parts):
+    # Merge the results of a sharded call back into a single Result. Tables
+    # are matched by name; the row and column keys of each merged table are
+    # the union of those from each part, in order
+    merged = []
+    index = {}
+    for part in parts:
+        for table in part:
+            try:
+                first, rows, row_set, cols, col_set, data = index[table.name]
+            except KeyError:
+                first, rows, row_set, cols, col_set, data = index[table.name] = (
+                    table, [], set(), [], set(), {})
+                merged.append(table.name)
+            for row in table.rows:
+                if row not in row_set:
+                    row_set.add(row)
+                    rows.append(row)
+            for col in table.cols:
+                if col not in col_set:
+                    col_set.add(col)
+                    cols.append(col)
+            data.update(table.data)
+    return results.Result(*(
+        results.Table(
+            name, rows, cols, data=data, title=first.title,
+            rows_title=first.rows_title, rows_unit=first.rows_unit,
+            cols_title=first.cols_title, cols_unit=first.cols_unit)
+        for name in merged
+        for (first, rows, row_set, cols, col_set, data) in (index[name],)
+        ))
 
 
 class UManSysProp(object):
@@ -108,6 +276,48 @@ class UManSysProp(object):
     :class:`~umansysprop.results.Table` for more information on accessing the
     result data.
 
+    All requests are sent through a single pooled HTTP session, so connections
+    to the server are kept alive and re-used between calls. The *pool_size*
+    parameter (default 10) specifies the maximum number of connections kept
+    open, which is only relevant when an instance is shared between several
+    threads. Requests which fail due to a connection error or a transient
+    server condition (HTTP status 429, 502, 503, or 504) are retried up to
+    *retries* times (default 3), waiting *backoff* seconds (default 0.5)
+    before the first retry and doubling the wait for each subsequent retry,
+    unless the server specifies a delay with a ``Retry-After`` header. The
+    optional *timeout* parameter specifies the number of seconds to wait for
+    the server to respond to each request; delays requested by the server are
+    never longer than this (or 60 seconds if *timeout* is not specified).
+
+    Calls which the server judges too expensive to answer immediately are run
+    as background jobs on the server; the client waits for these to complete
+    transparently, polling the server as often as it requests.
+
+    If a method is called with a list of compounds longer than the server
+    permits in a single call, the list is automatically split into chunks, the
+    chunks are sent as separate requests, and their results are merged back
+    into a single :class:`~umansysprop.results.Result` with rows in the
+    original order. The *shard_size* parameter can be used to specify a
+    smaller chunk size than the server's maximum, and *shard_concurrency*
+    (default 4) specifies how many chunks may be in flight at once.
+
+    If a :class:`~umansysprop.cache.ResultCache` is specified as the *cache*
+    parameter, results are stored in it and repeated calls with identical
+    parameters are answered from it without contacting the server. See
+    :meth:`bypass_cache` to refresh cached results.
+
+    The API manifest is stored in the user's cache directory (see
+    :class:`~umansysprop.cache.ResultCache`) after it is first retrieved, so
+    subsequent construction of an instance for the same *base_url* requires no
+    communication with the server. Methods are constructed when they are first
+    accessed, at which point the stored manifest is revalidated with the
+    server (once per instance). Set *cache_manifest* to :data:`False` to
+    disable storage of the manifest.
+
+    Call :meth:`close` to release the session's connections when the instance
+    is no longer required (instances can also be used as context managers to
+    the same effect).
+
     .. _UManSysProp: http://umansysprop.seaes.manchester.ac.uk/
     .. _JSON API: http://umansysprop.seaes.manchester.ac.uk/api
     """
@@ -117,55 +327,222 @@ def {name}(self, {params}):
     return self._json_rpc("{url}", {call})
 """
 
-    def __init__(self, base_url='http://umansysprop.seaes.manchester.ac.uk/'):
+    # HTTP status codes indicating a transient failure worth retrying
+    _retry_statuses = frozenset((429, 502, 503, 504))
+
+    # Longest delay honoured from a Retry-After header, if no timeout is set
+    _max_retry_delay = 60.0
+
+    def __init__(self, base_url='http://umansysprop.seaes.manchester.ac.uk/',
+            pool_size=10, retries=3, backoff=0.5, timeout=None,
+            shard_size=None, shard_concurrency=4, cache=None,
+            cache_manifest=True):
         self._base_url = base_url
-        response = requests.get(urljoin(self._base_url, 'api'), headers={
-            'Accept': 'application/json'})
-        response.raise_for_status()
-        for name, props in response.json().items():
-            # Construct a dynamic method for each function that the API
-            # defines.  The method will take the parameters specified by the
-            # API, and will have a doc-string also specified by the API
-            method_definition = self._method_template.format(
-                    name=name,
-                    url=props['url'],
-                    params=', '.join(props['params']),
-                    call=', '.join(
-                        '%s=%s' % (param, param) for param in props['params'])
-                    )
-            l = {}
-            exec(method_definition, globals(), l)
-            f = l[name]
-            f.__doc__ = props['doc']
-            setattr(self, name, types.MethodType(f, self))
+        self._cache = cache
+        self._local = threading.local()
+        self._shard_size = shard_size
+        self._shard_concurrency = shard_concurrency
+        self._retries = retries
+        self._backoff = backoff
+        self._timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._manifest = None
+        self._manifest_etag = None
+        self._manifest_valid = False
+        if cache_manifest:
+            self._manifest_file = os.path.join(
+                _default_path(), 'manifest-%s.json' % hashlib.sha256(
+                    base_url.encode('utf-8')).hexdigest()[:16])
+            self._load_manifest()
+        else:
+            self._manifest_file = None
+        if self._manifest is None:
+            self._fetch_manifest()
+
+    def __getattr__(self, name):
+        # Construct API methods lazily, on first access
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if not self._manifest_valid:
+            self._fetch_manifest()
+        try:
+            props = self._manifest[name]
+        except KeyError:
+            raise AttributeError(
+                '%r object has no attribute %r' % (self.__class__.__name__, name))
+        method = _make_method(self, name, props)
+        setattr(self, name, method)
+        return method
+
+    def __dir__(self):
+        return sorted(set(dir(self.__class__)) | set(self.__dict__) | set(self._manifest))
+
+    def _set_manifest(self, manifest, etag):
+        self._manifest = manifest
+        self._manifest_etag = etag
+        self._manifest_hash = ResultCache.key(manifest)
+        # Servers which predate compound list sharding don't provide lists
+        self._lists = {
+            props['url']: props.get('lists', {})
+            for props in manifest.values()
+            }
+
+    def _load_manifest(self):
+        try:
+            with io.open(self._manifest_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            self._set_manifest(stored['manifest'], stored['etag'])
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def _save_manifest(self):
+        # Storing the manifest merely saves fetching it in full next time, so
+        # failures (e.g. an unwritable cache directory) are ignored
+        path = os.path.dirname(self._manifest_file)
+        f = None
+        try:
+            try:
+                os.makedirs(path, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+            with tempfile.NamedTemporaryFile(
+                    'wb', dir=path, suffix='.tmp', delete=False) as f:
+                f.write(json.dumps({
+                    'url': self._base_url,
+                    'etag': self._manifest_etag,
+                    'manifest': self._manifest,
+                    }).encode('utf-8'))
+            _replace(f.name, self._manifest_file)
+        except (IOError, OSError):
+            if f is not None:
+                try:
+                    os.unlink(f.name)
+                except OSError:
+                    pass
+
+    def _fetch_manifest(self):
+        # Retrieve the API manifest, or revalidate the stored manifest
+        headers = {'Accept': 'application/json'}
+        if self._manifest is not None and self._manifest_etag:
+            headers['If-None-Match'] = self._manifest_etag
+        response = self._request(
+            'GET', urljoin(self._base_url, 'api'), headers=headers)
+        if response.status_code != 304:
+            response.raise_for_status()
+            self._set_manifest(response.json(), response.headers.get('ETag'))
+            if self._manifest_file is not None:
+                self._save_manifest()
+        self._manifest_valid = True
+
+    def close(self):
+        """
+        Closes all connections held open by the client.
+        """
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _request(self, method, url, **kwargs):
+        # Every method exposed by the API is a pure calculation so all
+        # requests, including POSTs, can be safely retried
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(
+                    method, url, timeout=self._timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self._retries:
+                    raise
+                delay = self._backoff * 2 ** attempt
+            else:
+                if (
+                        response.status_code not in self._retry_statuses or
+                        attempt >= self._retries):
+                    return response
+                delay = _retry_after(
+                    response.headers, self._backoff * 2 ** attempt,
+                    self._timeout or self._max_retry_delay)
+            time.sleep(delay)
+            attempt += 1
+
+    @contextmanager
+    def bypass_cache(self):
+        """
+        Returns a context manager within which calls made by the current
+        thread ignore any cached results. The fresh results are still stored
+        in the cache, so this can be used to refresh stale results::
+
+            with client.bypass_cache():
+                client.vapour_pressure(...)
+        """
+        bypass = getattr(self._local, 'bypass_cache', False)
+        self._local.bypass_cache = True
+        try:
+            yield
+        finally:
+            self._local.bypass_cache = bypass
 
     def _json_rpc(self, url, **params):
-        response = requests.post(
+        if self._cache is None:
+            return self._sharded_call(url, params)
+        key = self._cache.key(
+            self._base_url, url, params, self._manifest_hash, __version__)
+        if not getattr(self._local, 'bypass_cache', False):
+            result = self._cache.get(key)
+            if result is not None:
+                return result
+        result = self._sharded_call(url, params)
+        self._cache.put(key, result)
+        return result
+
+    def _sharded_call(self, url, params):
+        shards = _shard_params(params, self._lists.get(url, {}), self._shard_size)
+        if len(shards) == 1:
+            return self._call(url, params)
+        pool = ThreadPool(min(self._shard_concurrency, len(shards)))
+        try:
+            return _merge_results(
+                pool.map(lambda shard: self._call(url, shard), shards))
+        finally:
+            pool.terminate()
+
+    def _call(self, url, params):
+        response = self._request(
+                'POST',
                 urljoin(self._base_url, url),
                 data=json.dumps(params),
                 headers={
-                    'Accept': 'application/json',
+                    'Accept': _result_accept(),
                     'Content-Type': 'application/json',
                     })
-        if 400 <= response.status_code < 500:
-            # Some kind of client error; try and decode the body as JSON to
-            # determine the details and raise a reasonable exception
-            exc_type = response.json()['exc_type']
-            exc_value = response.json()['exc_value']
-            # Only permit a specific set of exceptions
-            exc_class = {
-                'ValueError':   ValueError,
-                'NameError':    NameError,
-                'KeyError':     KeyError,
-                }[exc_type]
-            if isinstance(exc_value, str):
-                raise exc_class(exc_value)
-            else:
-                raise exc_class(*exc_value)
-        elif response.status_code >= 500:
-            import pdb; pdb.set_trace()
-            raise RuntimeError('Server error: %s' % response.body)
-        else:
+        if response.status_code == 202:
+            # The server is calculating the result in the background; poll
+            # the job's location until it has finished
+            location = urljoin(self._base_url, response.headers['Location'])
+            while response.status_code == 202:
+                time.sleep(_retry_after(
+                    response.headers, self._backoff,
+                    self._timeout or self._max_retry_delay))
+                response = self._request(
+                        'GET', location,
+                        headers={'Accept': _result_accept()})
+        if response.status_code >= 400:
+            # The server reports errors as JSON whatever the status
+            details = _error_details(response.content)
+            if details is not None:
+                _raise_error(details)
+            elif response.status_code >= 500:
+                raise RuntimeError('Server error: %s' % response.text)
             response.raise_for_status()
-        return results.Result.from_json(response.json())
+        return _decode_result(
+            response.headers.get('Content-Type', ''), response.content)
 
@@ -0,0 +1,185 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Limits on the number of tool calls executing at once, with a bounded queue
+for calls waiting to execute, so that bursts of requests are shed quickly
+rather than slowing every request down together
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """
+    Raised when a call cannot be admitted because the queue is full, or the
+    call waited in the queue for too long. The *reason* attribute is "full"
+    or "timeout" accordingly.
+    """
+    def __init__(self, reason, message):
+        super(Overloaded, self).__init__(message)
+        self.reason = reason
+
+
+class ConcurrencyLimiter(object):
+    """
+    Admits at most *max_active* calls at once, and at most the number given
+    by *tool_active* (a mapping of tool name to limit, which may be altered at
+    any time) for particular tools. Calls which can't be admitted immediately
+    wait in a queue of at most *max_queued* calls for up to *max_wait*
+    seconds, and are admitted in the order they arrived; calls which would
+    exceed the queue, or which wait too long, raise :exc:`Overloaded`.
+
+    If *metrics* (a :class:`~umansysprop.metrics.Metrics` instance) is
+    given, the depth of the queue, the number of active calls, the time calls
+    spend waiting, and the number of calls shed are recorded in it.
+    """
+
+    def __init__(
+            self, max_active=8, max_queued=32, max_wait=10.0, tool_active=None,
+            metrics=None):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.tool_active = {} if tool_active is None else tool_active
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._active = 0
+        self._tool_active = {}
+        # Queued calls in arrival order, each a [name, condition, admitted]
+        # list; every waiter has its own condition (sharing the lock) so that
+        # it can be woken individually
+        self._waiters = deque()
+
+    def _available(self, name):
+        if self._active >= self.max_active:
+            return False
+        limit = self.tool_active.get(name)
+        return limit is None or self._tool_active.get(name, 0) < limit
+
+    def _admit(self, name):
+        self._active += 1
+        self._tool_active[name] = self._tool_active.get(name, 0) + 1
+
+    def _grant(self):
+        # Called with the lock held: admit queued calls in arrival order. A
+        # call which can't proceed (because its tool is at its limit) doesn't
+        # hold up later calls for other tools, but a later call is never
+        # admitted in preference to an earlier one which could proceed
+        for waiter in list(self._waiters):
+            name, cond, admitted = waiter
+            if self._active >= self.max_active:
+                break
+            if self._available(name):
+                self._admit(name)
+                waiter[2] = True
+                self._waiters.remove(waiter)
+                cond.notify()
+
+    def _update(self, name):
+        # Called with the lock held to publish the state of the queue
+        if self.metrics is not None:
+            self.metrics.set(
+                'umansysprop_queue_depth', len(self._waiters),
+                help='Tool calls waiting to execute')
+            self.metrics.set(
+                'umansysprop_active_calls', self._tool_active.get(name, 0),
+                help='Tool calls executing', tool=name)
+
+    def _shed(self, name, reason, message):
+        if self.metrics is not None:
+            self.metrics.inc(
+                'umansysprop_calls_shed_total', tool=name, reason=reason,
+                help='Tool calls rejected because the server was overloaded')
+        raise Overloaded(reason, message)
+
+    def acquire(self, name):
+        """
+        Admits a call to the tool *name*, waiting in the queue if necessary.
+        Queued calls are admitted in the order they arrived. Returns the
+        number of seconds the call waited. Every successful call must be
+        paired with a call to :meth:`release`.
+        """
+        start = time.time()
+        with self._lock:
+            # The tool limits may have been raised since the last release
+            self._grant()
+            # Calls still queued after that can't proceed, so a new call may
+            # only overtake them if they're waiting on their own tool's limit
+            if self._available(name):
+                self._admit(name)
+            else:
+                if len(self._waiters) >= self.max_queued:
+                    self._shed(name, 'full', 'Server busy; queue is full')
+                waiter = [name, threading.Condition(self._lock), False]
+                self._waiters.append(waiter)
+                self._update(name)
+                deadline = start + self.max_wait
+                while not waiter[2]:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._waiters.remove(waiter)
+                        self._update(name)
+                        self._shed(
+                            name, 'timeout',
+                            'Server busy; waited %.1fs' % self.max_wait)
+                    waiter[1].wait(remaining)
+            self._update(name)
+        waited = time.time() - start
+        if self.metrics is not None:
+            self.metrics.observe(
+                'umansysprop_queue_wait_seconds', waited,
+                help='Time admitted tool calls spent queued')
+        return waited
+
+    def release(self, name):
+        """
+        Releases the admission of a call to the tool *name*, admitting the
+        earliest queued calls which may now proceed.
+        """
+        with self._lock:
+            self._active -= 1
+            self._tool_active[name] -= 1
+            self._grant()
+            self._update(name)
+
+    @contextmanager
+    def slot(self, name):
+        """
+        Returns a context manager which admits a call to the tool *name* for
+        the duration of the block.
+        """
+        self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name)
@@ -27,6 +27,26 @@ from __future__ import (
 str = type('')
 
 
+# Translation table mapping characters that are special in HTML and XML to
+# their entity references; used to escape content in a single pass
+
+_ESCAPES = {
+    ord('&'): '&amp;',
+    ord('"'): '&quot;',
+    ord('<'): '&lt;',
+    ord('>'): '&gt;',
+    }
+
+
+def escape(s):
+    "Return s with all HTML/XML special characters replaced by entities"
+    # The membership tests are much cheaper than translate for the common
+    # case of content with nothing to escape
+    if '&' in s or '"' in s or '<' in s or '>' in s:
+        return s.translate(_ESCAPES)
+    return s
+
+
 class literal(str):
     "A str sub-class that assumes its content is HTML"
     def __html__(self):
@@ -36,11 +56,7 @@ class literal(str):
 class content(str):
     "A str sub-class which escapes content for inclusion in HTML"
     def __html__(self):
-        return literal(self.\
-                replace('&', '&amp;').\
-                replace('"', '&quot;').\
-                replace('<', '&lt;').\
-                replace('>', '&gt;'))
+        return literal(escape(self))
 
 
 def html(s):
@@ -130,51 +146,66 @@ class TagFactory(object):
         >>> tag.hr()
         '<hr/>'
     """
+    # Cache mapping attribute names, as given to the generator methods, to
+    # their normalized form in the output; shared by all instances
+    _attr_names = {}
+
     def __init__(self, xml=False):
         self._xml = xml
 
-    def _format(self, content):
+    def _format(self, content, tokens):
+        # Append the formatted form of content to the list of tokens,
+        # flattening any nested iterables into the same list
         if isinstance(content, str):
-            return html(content)
+            tokens.append(html(content))
         elif isinstance(content, bytes):
-            return html(content.decode('utf-8'))
+            tokens.append(html(content.decode('utf-8')))
+        elif isinstance(content, (int, float)):
+            tokens.append(str(content))
         else:
             try:
-                return literal(''.join(self._format(item) for item in content))
+                items = iter(content)
             except TypeError:
-                return html(content)
-
-    def _generate(self, _tag, *args, **kwargs):
-        _tag = _tag.rstrip('_')
-        result = ''
-        open_tag = kwargs.get('_open', True)
-        close_tag = kwargs.get('_close', self._xml or _tag.lower() not in EMPTY_ELEMENTS)
-        empty_tag = not args
+                tokens.append(html(content))
+            else:
+                for item in items:
+                    self._format(item, tokens)
+
+    def _generate(self, _tag, _close_default, *args, **kwargs):
+        open_tag = kwargs.pop('_open', True)
+        close_tag = kwargs.pop('_close', _close_default)
+        tokens = []
         if open_tag:
-            if empty_tag and not close_tag and self._xml:
-                template = '<%s%s/>'
+            tokens.append('<' + _tag)
+            names = self._attr_names
+            for (k, v) in kwargs.items():
+                if v is None or v is False:
+                    continue
+                try:
+                    k = names[k]
+                except KeyError:
+                    k = names[k] = k.rstrip('_').replace('_', '-')
+                if v is True:
+                    v = k
+                elif not isinstance(v, (int, float)):
+                    # Numbers never require escaping
+                    v = escape(str(v))
+                tokens.append(' %s="%s"' % (k, v))
+            if not args and not close_tag and self._xml:
+                tokens.append('/>')
             else:
-                template = '<%s%s>'
-            result += template % (
-                _tag,
-                ''.join(
-                    ' %s="%s"' % (
-                        k, k if v is True else content(v).__html__()
-                        )
-                    for (_k, v) in kwargs.items()
-                    for k in (_k.rstrip('_').replace('_', '-'),)
-                    if v is not None
-                    and v is not False)
-                )
-            for arg in args:
-                result += self._format(arg)
+                tokens.append('>')
+                for arg in args:
+                    self._format(arg, tokens)
         if close_tag:
-            result += '</%s>' % _tag
-        return literal(result)
+            tokens.append('</%s>' % _tag)
+        return literal(''.join(tokens))
 
     def __getattr__(self, attr):
+        name = attr.rstrip('_')
+        close_tag = self._xml or name.lower() not in EMPTY_ELEMENTS
         def generator(*args, **kwargs):
-            return self._generate(attr, *args, **kwargs)
+            return self._generate(name, close_tag, *args, **kwargs)
         setattr(self, attr, generator)
         return generator
 
@@ -0,0 +1,166 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Background execution of tool calls which are too expensive to run while the
+client waits for a response
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import uuid
+import time
+import threading
+from collections import OrderedDict
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .results import EvaluationContext
+
+
+class Job(object):
+    """
+    A background tool call. The :attr:`state` is one of "pending", "running",
+    "done", or "failed". Once done, :attr:`result` holds the function's
+    return value; if failed, :attr:`error` holds the exception it raised.
+    Progress is available from :attr:`context` (an
+    :class:`~umansysprop.results.EvaluationContext`) while running.
+    """
+
+    def __init__(self, name, func, args, mimetype, title, total=None):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.mimetype = mimetype
+        self.title = title
+        self.state = 'pending'
+        self.result = None
+        self.error = None
+        self.finished = None
+        self.context = EvaluationContext()
+        self.context.total = total
+        self._func = func
+        self._args = args
+
+    def _run(self):
+        self.state = 'running'
+        try:
+            with self.context:
+                self.result = self._func(*self._args)
+        except Exception as e:
+            # The traceback's frames may reference large intermediate values
+            # which mustn't be kept alive with the job
+            if hasattr(e, '__traceback__'):
+                e.__traceback__ = None
+            self.error = e
+            self.state = 'failed'
+        else:
+            self.state = 'done'
+        finally:
+            self._func = self._args = None
+            self.finished = time.time()
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'tool': self.name,
+            'state': self.state,
+            'done': self.context.done,
+            'total': self.context.total,
+            }
+
+
+class JobRunner(object):
+    """
+    Runs jobs on a pool of *workers* threads. At most *max_jobs* jobs may be
+    pending or running at once. Finished jobs are retained for *ttl* seconds,
+    after which :meth:`get` no longer finds them. Jobs retain their results,
+    so functions returning large values should store them elsewhere (the
+    server uses its :class:`~umansysprop.store.ResultStore`) and return a
+    reference to them. Like the
+    :class:`~umansysprop.store.ResultStore`, jobs are local to the process.
+    """
+
+    def __init__(self, workers=2, max_jobs=8, ttl=600):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._jobs = OrderedDict()
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            job._run()
+
+    def _expire(self, now):
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and job.finished + self.ttl < now:
+                del self._jobs[job_id]
+
+    def _active(self):
+        return sum(
+            1 for job in self._jobs.values()
+            if job.state in ('pending', 'running'))
+
+    @property
+    def available(self):
+        """
+        Returns :data:`True` if another job can be submitted.
+        """
+        with self._lock:
+            return self._active() < self.max_jobs
+
+    def submit(self, job):
+        """
+        Queues *job* for execution. Raises :exc:`ValueError` if the maximum
+        number of jobs are already pending or running.
+        """
+        with self._lock:
+            self._expire(time.time())
+            if self._active() >= self.max_jobs:
+                raise ValueError('Too many jobs; maximum %d' % self.max_jobs)
+            self._jobs[job.id] = job
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """
+        Returns the job with the specified *job_id*. Raises :exc:`KeyError` if
+        there is no such job, or it has expired.
+        """
+        with self._lock:
+            self._expire(time.time())
+            return self._jobs[job_id]
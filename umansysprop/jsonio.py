@@ -0,0 +1,179 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+=============================
+``umansysprop.jsonio`` Module
+=============================
+
+This module provides JSON encoding and decoding for the server, the renderers,
+and the client library using the fastest suitable JSON library. By default
+this is `ujson`_ if it is installed, or the standard library's :mod:`json`
+module otherwise. Both write NaN and infinite values with the non-standard
+``NaN`` and ``Infinity`` extensions, as the server always has. NumPy arrays
+and scalars are encoded as JSON arrays and numbers; neither library encodes
+them natively, so they're first converted to lists and Python numbers with
+their ``tolist`` method, which costs a pass over the array.
+
+`orjson`_ is faster still, and encodes NumPy arrays natively without that
+conversion, but it encodes NaN and infinite values as ``null``, which
+changes the output for any result containing them (missing or failed
+calculations, for example). It is therefore only used when selected
+explicitly with ``set_backend('orjson')``, by deployments whose clients
+accept ``null`` in place of those values.
+
+.. autofunction:: dumps
+
+.. autofunction:: loads
+
+.. autofunction:: backend
+
+.. autofunction:: set_backend
+
+.. _orjson: https://github.com/ijl/orjson
+.. _ujson: https://github.com/ultrajson/ultrajson
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import json
+import decimal
+from collections import OrderedDict
+
+
+def _default(obj):
+    # Encode NumPy arrays and scalars (both of which provide tolist) and
+    # decimals, which the JSON libraries don't handle natively
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    elif isinstance(obj, decimal.Decimal):
+        return float(obj)
+    raise TypeError('%r is not JSON serializable' % obj)
+
+
+def _json_dumps(obj, **kwargs):
+    kwargs.setdefault('default', _default)
+    kwargs.setdefault('separators', (',', ':'))
+    return json.dumps(obj, **kwargs).encode('utf-8')
+
+
+def _json_loads(s):
+    if isinstance(s, bytes):
+        s = s.decode('utf-8')
+    return json.loads(s)
+
+
+_BACKENDS = OrderedDict()
+
+# Backends which alter the output for some values, and are therefore never
+# selected by default
+_OPT_IN = {'orjson'}
+
+try:
+    import orjson
+except ImportError:
+    pass
+else:
+    def _orjson_dumps(obj):
+        return orjson.dumps(
+            obj, default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    _BACKENDS['orjson'] = (_orjson_dumps, orjson.loads)
+
+try:
+    import ujson
+except ImportError:
+    pass
+else:
+    def _ujson_dumps(obj):
+        # ujson escapes "/" by default, which the other libraries don't; the
+        # output must not depend on the library (SMILES often contain "/")
+        return ujson.dumps(
+            obj, default=_default, escape_forward_slashes=False).encode('utf-8')
+    _BACKENDS['ujson'] = (_ujson_dumps, ujson.loads)
+
+_BACKENDS['json'] = (_json_dumps, _json_loads)
+
+
+def set_backend(name=None):
+    """
+    Selects the JSON library used by :func:`dumps` and :func:`loads`. The
+    *name* may be ``'orjson'``, ``'ujson'``, or ``'json'``, or :data:`None`
+    (the default) to select the fastest library available which preserves
+    NaN and infinite values (i.e. anything but orjson). Raises
+    :exc:`ValueError` if the specified library is not available.
+    """
+    global _backend, _dumps, _loads
+    if name is None:
+        name = next(n for n in _BACKENDS if n not in _OPT_IN)
+    try:
+        _dumps, _loads = _BACKENDS[name]
+    except KeyError:
+        raise ValueError('JSON backend %s is not available' % name)
+    _backend = name
+
+
+def backend():
+    """
+    Returns the name of the JSON library in use.
+    """
+    return _backend
+
+
+def dumps(obj, **kwargs):
+    """
+    Returns *obj* encoded as JSON in a UTF-8 encoded :class:`bytes` string.
+    Any keyword arguments are passed to the standard library's
+    :func:`json.dumps` (in which case it is used regardless of the backend
+    selected). The standard library is also used for values which the backend
+    cannot encode (for example, integers too large for orjson).
+    """
+    if not kwargs:
+        try:
+            return _dumps(obj)
+        except (TypeError, ValueError, OverflowError):
+            if _dumps is _json_dumps:
+                raise
+    return _json_dumps(obj, **kwargs)
+
+
+def loads(s):
+    """
+    Returns the object decoded from the JSON in *s*, which may be a
+    :class:`str` or UTF-8 encoded :class:`bytes` string. Raises
+    :exc:`ValueError` if *s* is not valid JSON. The standard library is used
+    for documents which the backend rejects, so the ``NaN`` and ``Infinity``
+    extensions it produces are always accepted.
+    """
+    try:
+        return _loads(s)
+    except ValueError:
+        if _loads is _json_loads:
+            raise
+    return _json_loads(s)
+
+
+set_backend()
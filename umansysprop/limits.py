@@ -0,0 +1,267 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Limits on the wall-clock time, CPU time, and memory that a tool's handler may
+use. Limits other than wall-clock time can only be enforced by the operating
+system, so handlers subject to them are run in a supervised subprocess.
+
+The server is multi-threaded, and forking a multi-threaded process can
+deadlock the child on locks held by other threads at the time of the fork.
+Subprocesses are therefore started by a fork server (or spawned, where that
+is unavailable), and the function they call is passed by module and name.
+Python 2 can only fork; there, :func:`run` refuses to start a subprocess
+while other threads are running, so isolated tools require a server which
+handles requests in a single thread (and no background jobs). As with any
+use of :mod:`multiprocessing`, a script which starts the server must do so
+under ``if __name__ == '__main__':`` as subprocesses import it.
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import pickle
+import signal
+import threading
+import importlib
+import multiprocessing
+from collections import namedtuple
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where only wall-clock limits are enforced
+    resource = None
+
+from .results import Result, Table, EvaluationContext, DeadlineExceeded
+
+try:
+    TimeoutError = TimeoutError
+except NameError:
+    # Python 2 has no TimeoutError
+    class TimeoutError(OSError):
+        pass
+
+
+class Limits(namedtuple('Limits', (
+    'timeout',
+    'cpu',
+    'memory',
+    'isolate',
+    ))):
+    """
+    The limits for a tool: *timeout* is the number of seconds of wall-clock
+    time, *cpu* the number of seconds of CPU time, and *memory* the number of
+    bytes of address space that the handler may use. Each defaults to
+    :data:`None` (unlimited). If *cpu* or *memory* are specified, or
+    *isolate* is :data:`True`, the handler must be called with :func:`run`.
+    """
+    __slots__ = ()
+
+    def __new__(cls, timeout=None, cpu=None, memory=None, isolate=False):
+        return super(Limits, cls).__new__(cls, timeout, cpu, memory, isolate)
+
+    @property
+    def isolated(self):
+        return self.isolate or self.cpu is not None or self.memory is not None
+
+
+class TimeLimitExceeded(TimeoutError):
+    """
+    Raised when a handler exceeds its wall-clock or CPU time limit. The
+    *limit* attribute is "timeout" or "cpu" accordingly.
+    """
+    def __init__(self, limit, message):
+        super(TimeLimitExceeded, self).__init__(message)
+        self.limit = limit
+
+    def __reduce__(self):
+        return (self.__class__, (self.limit, str(self)))
+
+
+class MemoryLimitExceeded(ValueError):
+    """
+    Raised when a handler exceeds its memory limit. The *limit* attribute is
+    always "memory".
+    """
+    limit = 'memory'
+
+
+def _reference(func):
+    # Return the module and name by which the subprocess can import func
+    module = func.__module__
+    name = getattr(func, '__qualname__', func.__name__)
+    if '<' in name:
+        raise ValueError(
+            '%s.%s cannot be called in a subprocess as it is not defined at '
+            'the top level of its module' % (module, name))
+    return module, name
+
+
+def _resolve(reference):
+    module, name = reference
+    obj = importlib.import_module(module)
+    for attr in name.split('.'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def _child(conn, limits, reference, args, kwargs):
+    # Executed in the subprocess: apply the limits, call the function, and
+    # send back whether it succeeded along with its result or exception
+    try:
+        func = _resolve(reference)
+        if resource is not None:
+            if limits.cpu is not None:
+                # Exceeding the soft limit raises SIGXCPU, which terminates
+                # the process; the hard limit is a backstop
+                resource.setrlimit(
+                    resource.RLIMIT_CPU, (limits.cpu, limits.cpu + 1))
+            if limits.memory is not None:
+                resource.setrlimit(
+                    resource.RLIMIT_AS, (limits.memory, limits.memory))
+        with EvaluationContext(timeout=limits.timeout):
+            data = pickle.dumps((True, func(*args, **kwargs)), protocol=2)
+    except MemoryError:
+        # Reported without an exception as there may not be the memory to
+        # construct one
+        data = pickle.dumps((False, None), protocol=2)
+    except DeadlineExceeded as e:
+        data = pickle.dumps(
+            (False, TimeLimitExceeded('timeout', str(e))), protocol=2)
+    except Exception as e:
+        try:
+            data = pickle.dumps((False, e), protocol=2)
+        except Exception:
+            data = pickle.dumps((False, RuntimeError(repr(e))), protocol=2)
+    conn.send_bytes(data)
+    conn.close()
+
+
+def _context():
+    # See the module docs: a fork server is preferred, then spawning. Either
+    # way the function, its arguments and its result must be picklable
+    try:
+        methods = multiprocessing.get_all_start_methods()
+    except AttributeError:
+        # Python 2 always forks
+        return multiprocessing
+    return multiprocessing.get_context(
+        'forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def preload(*modules):
+    """
+    Imports *modules* in the fork server when it starts (if one is used), so
+    that subprocesses started from it needn't import them again. Must be
+    called before the first call to :func:`run`.
+    """
+    context = _context()
+    if getattr(context, 'get_start_method', lambda: None)() == 'forkserver':
+        context.set_forkserver_preload(list(modules))
+
+
+def run(limits, func, *args, **kwargs):
+    """
+    Calls *func* with *args* and *kwargs* in a subprocess subject to
+    *limits* (a :class:`Limits` instance) and returns its result. The
+    subprocess imports *func* by module and name, so it must be defined at
+    the top level of a module; *args*, *kwargs*, and the result must be
+    picklable. Note that :class:`~umansysprop.results.Table` objects are
+    evaluated lazily, so *func* must calculate any result it returns (see
+    :func:`evaluated`).
+
+    Raises :exc:`TimeLimitExceeded` or :exc:`MemoryLimitExceeded` if the
+    subprocess exceeds its limits, and re-raises any exception raised by
+    *func*. Raises :exc:`RuntimeError` if the subprocess would have to be
+    forked from a multi-threaded process (see the module docs).
+    """
+    context = _context()
+    if context is multiprocessing and threading.active_count() > 1:
+        raise RuntimeError(
+            'Tools with CPU or memory limits cannot be run by a '
+            'multi-threaded server under this version of Python')
+    recv_conn, send_conn = context.Pipe(duplex=False)
+    process = context.Process(
+        target=_child,
+        args=(send_conn, limits, _reference(func), args, kwargs))
+    process.daemon = True
+    process.start()
+    send_conn.close()
+    try:
+        if not recv_conn.poll(limits.timeout):
+            raise TimeLimitExceeded(
+                'timeout', 'Tool exceeded its time limit of %ss' % limits.timeout)
+        try:
+            success, value = pickle.loads(recv_conn.recv_bytes())
+        except EOFError:
+            # The process died without reporting back
+            process.join()
+            if limits.cpu is not None and process.exitcode in (
+                    -signal.SIGXCPU, -signal.SIGKILL):
+                raise TimeLimitExceeded(
+                    'cpu', 'Tool exceeded its CPU limit of %ss' % limits.cpu)
+            elif limits.memory is not None:
+                raise MemoryLimitExceeded(
+                    'Tool exceeded its memory limit of %d bytes' % limits.memory)
+            raise RuntimeError(
+                'Tool process failed with exit code %s' % process.exitcode)
+    finally:
+        recv_conn.close()
+        if process.is_alive():
+            process.terminate()
+        process.join()
+    if success:
+        return value
+    elif value is None:
+        raise MemoryLimitExceeded(
+            'Tool exceeded its memory limit of %d bytes' % limits.memory)
+    raise value
+
+
+def evaluated(result):
+    """
+    Returns a copy of *result* (a :class:`~umansysprop.results.Result`) which
+    can be returned from a subprocess: all values are calculated, and keys
+    are replaced by their labels (so molecules, which cannot be pickled,
+    become their SMILES). The copy renders identically to the original.
+    """
+    return Result(*(
+        Table(
+            table.name,
+            rows=[
+                label if table.row_dims > 1 else label[0]
+                for label in table.row_labels
+                ],
+            cols=[
+                label if table.col_dims > 1 else label[0]
+                for label in table.col_labels
+                ],
+            values=table._evaluate(),
+            title=table.title,
+            rows_title=table.rows_title, rows_unit=table.rows_unit,
+            cols_title=table.cols_title, cols_unit=table.cols_unit)
+        for table in result
+        ))
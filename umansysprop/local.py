@@ -0,0 +1,114 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+============================
+``umansysprop.local`` Module
+============================
+
+This module contains an in-process equivalent of the client library, for use
+on machines which have the server package (and its dependencies) installed.
+Only one user-accessible class is defined in the module:
+
+LocalUManSysProp
+================
+
+.. autoclass:: LocalUManSysProp
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+from textwrap import dedent
+
+from . import tools, forms
+from .client import _make_method
+from .server import app
+
+
+class LocalUManSysProp(object):
+    """
+    Provides the same interface as :class:`~umansysprop.client.UManSysProp`,
+    but calls the calculation tools directly within the current process rather
+    than sending requests to a server. The methods exposed, their parameters,
+    and their docstrings are identical to those of the remote client, so
+    switching between the two is a matter of changing the constructor::
+
+        >>> from umansysprop.local import LocalUManSysProp
+        >>> client = LocalUManSysProp()
+        >>> result = client.vapour_pressure(
+        ... ['CCCC', 'C(CC(=O)O)C(=O)O'], [298.15, 299.15],
+        ... 'nannoolal', 'nannoolal')
+
+    Parameters are converted exactly as the server converts those of a JSON
+    request, but no serialization of parameters or results takes place. Each
+    method returns the :class:`~umansysprop.results.Result` constructed by the
+    tool, whose values are calculated when they are first accessed. Errors
+    raised by a tool propagate to the caller as the exceptions the remote
+    client would raise.
+    """
+
+    _method_template = """\
+def {name}(self, {params}):
+    return self._call("{url}", {call})
+"""
+
+    def __init__(self):
+        self._tools = tools.modules()
+        for name, mod in self._tools.items():
+            setattr(self, name, _make_method(self, name, {
+                'url': name,
+                'doc': dedent(mod.handler.__doc__ or ''),
+                'params': [
+                    field.name for field in self._form(mod)
+                    if field.name not in ('csrf_token', 'output_format')
+                    ],
+                }))
+
+    @staticmethod
+    def _form(mod):
+        # Construct the tool's form without CSRF protection, which is
+        # irrelevant here. The forms expect the application and request
+        # contexts of the server so they're constructed within a dummy
+        # request, which also keeps them away from the caller's request (if
+        # any)
+        with app.test_request_context():
+            return mod.HandlerForm(formdata=None, csrf_enabled=False)
+
+    def close(self):
+        """
+        Provided for compatibility with the remote client; does nothing.
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _call(self, name, params):
+        mod = self._tools[name]
+        return mod.handler(**forms.convert_args(self._form(mod), params))
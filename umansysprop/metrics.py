@@ -0,0 +1,130 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Simple counters, gauges, and summaries describing the operation of the server,
+exposed in the Prometheus text format by the server's ``/metrics`` page
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import threading
+from collections import OrderedDict
+
+
+class Metrics(object):
+    """
+    A thread-safe collection of named counters, gauges, and summaries, each
+    of which may be qualified by labels (given as keyword arguments). Note
+    that the metrics are local to the process; in a multi-process deployment
+    each process reports its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Maps name -> (type, help, {labels: value})
+        self._metrics = OrderedDict()
+
+    def _values(self, name, kind, help):
+        try:
+            metric_kind, metric_help, values = self._metrics[name]
+        except KeyError:
+            values = {}
+            self._metrics[name] = (kind, help, values)
+        else:
+            if metric_kind != kind:
+                raise ValueError('%s is a %s, not a %s' % (name, metric_kind, kind))
+        return values
+
+    def inc(self, name, value=1, help='', **labels):
+        """
+        Adds *value* to the counter *name* with the specified labels.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values(name, 'counter', help)
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name, value, help='', **labels):
+        """
+        Sets the gauge *name* with the specified labels to *value*.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values(name, 'gauge', help)[key] = value
+
+    def observe(self, name, value, help='', **labels):
+        """
+        Records an observation of *value* (e.g. a duration) in the summary
+        *name* with the specified labels. Summaries are reported as the sum
+        and count of their observations, so that averages can be derived.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._values(name, 'summary', help)
+            total, count = values.get(key, (0, 0))
+            values[key] = (total + value, count + 1)
+
+    def get(self, name, **labels):
+        """
+        Returns the value of the metric *name* with the specified labels, or
+        0 if it has never been set. The value of a summary is a tuple of the
+        sum and count of its observations.
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            try:
+                return self._metrics[name][2].get(key, 0)
+            except KeyError:
+                return 0
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, (kind, help, values) in self._metrics.items():
+                if help:
+                    lines.append('# HELP %s %s' % (name, help))
+                lines.append('# TYPE %s %s' % (name, kind))
+                for key, value in sorted(values.items()):
+                    labels = ','.join(
+                        '%s="%s"' % (label, str(label_value)
+                            .replace('\\', '\\\\')
+                            .replace('"', '\\"')
+                            .replace('\n', '\\n'))
+                        for (label, label_value) in key
+                        )
+                    labels = '{%s}' % labels if labels else ''
+                    if kind == 'summary':
+                        total, count = value
+                        lines.append('%s_sum%s %s' % (name, labels, total))
+                        lines.append('%s_count%s %s' % (name, labels, count))
+                    else:
+                        lines.append('%s%s %s' % (name, labels, value))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,166 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Estimation of the cost of a tool call before it is executed, and the decision
+whether to run the call immediately, as a background job, or not at all
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import threading
+from collections import namedtuple, OrderedDict
+
+
+class Plan(namedtuple('Plan', (
+    'tool',
+    'tables',
+    'cells',
+    'cell_cost',
+    'cost',
+    'action',
+    'status',
+    'reason',
+    ))):
+    """
+    The plan for a tool call. The *tables* attribute maps each table's name to
+    its (rows, cols) shape, and *cells* is the total number of cells (both are
+    :data:`None` if the tool doesn't declare its shapes). The *cell_cost* is
+    the estimated number of seconds to calculate a cell and *cost* the
+    estimated number of seconds for the whole call. The *action* is one of
+    "run", "background", or "reject", and *status* the corresponding HTTP
+    status (200, 202, or 413 / 503 for rejections), with *reason* a human
+    readable explanation.
+    """
+    __slots__ = ()
+
+    def as_dict(self):
+        result = self._asdict()
+        if self.tables is not None:
+            result['tables'] = OrderedDict(
+                (name, {'rows': rows, 'cols': cols})
+                for name, (rows, cols) in self.tables.items()
+                )
+        return result
+
+
+class Planner(object):
+    """
+    Plans tool calls from the shapes of the tables they will produce and the
+    historical cost of each tool's cells.
+
+    A tool declares the shapes of its tables with an optional ``shapes``
+    function in its module. This accepts the same (converted) arguments as the
+    tool's handler and returns a mapping of table name to a (rows, cols)
+    tuple; it must be cheap, i.e. calculate nothing but the lengths of its
+    arguments. Calls to tools which don't declare their shapes are always run.
+
+    The cost of a tool's cells starts at *cell_cost* seconds and is updated by
+    :meth:`record` with an exponentially weighted moving average (*weight*
+    being the weight of each new observation). Calls estimated to take up to
+    *sync_cost* seconds are run immediately, and those estimated to take up
+    to *max_cost* seconds in the background (when *background* is permitted
+    and the caller has the capacity). Calls with more than *max_cells* cells,
+    or estimated to take longer than *max_cost*, are rejected.
+    """
+
+    def __init__(
+            self, sync_cost=10.0, max_cost=600.0, max_cells=10000000,
+            cell_cost=0.0001, weight=0.2):
+        self.sync_cost = sync_cost
+        self.max_cost = max_cost
+        self.max_cells = max_cells
+        self.default_cell_cost = cell_cost
+        self.weight = weight
+        self._lock = threading.Lock()
+        self._cell_costs = {}
+
+    def cell_cost(self, name):
+        """
+        Returns the estimated number of seconds to calculate a cell of the
+        tool *name*.
+        """
+        with self._lock:
+            return self._cell_costs.get(name, self.default_cell_cost)
+
+    def record(self, name, cells, seconds):
+        """
+        Records that a call to the tool *name* calculated *cells* cells in
+        *seconds* seconds.
+        """
+        if cells:
+            cost = seconds / cells
+            with self._lock:
+                try:
+                    old_cost = self._cell_costs[name]
+                except KeyError:
+                    self._cell_costs[name] = cost
+                else:
+                    self._cell_costs[name] = (
+                        old_cost + self.weight * (cost - old_cost))
+
+    def plan(self, name, mod, args, background=True):
+        """
+        Returns a :class:`Plan` for calling the tool *name* (implemented by
+        the module *mod*) with the converted *args*. If *background* is
+        :data:`False` (e.g. because the caller has no capacity for background
+        jobs), calls which would have run in the background are rejected with
+        status 503 instead.
+        """
+        cell_cost = self.cell_cost(name)
+        shapes = getattr(mod, 'shapes', None)
+        if shapes is None:
+            return Plan(
+                name, None, None, cell_cost, None, 'run', 200,
+                'Tool does not declare the shapes of its tables')
+        tables = OrderedDict(
+            (table_name, (rows, cols))
+            for table_name, (rows, cols) in shapes(**args).items()
+            )
+        cells = sum(rows * cols for (rows, cols) in tables.values())
+        cost = cells * cell_cost
+        if cells > self.max_cells:
+            action, status, reason = 'reject', 413, (
+                'Result would have %d cells; maximum %d' % (
+                    cells, self.max_cells))
+        elif cost > self.max_cost:
+            action, status, reason = 'reject', 413, (
+                'Result would take %.1fs to calculate; maximum %.1fs' % (
+                    cost, self.max_cost))
+        elif cost <= self.sync_cost:
+            action, status, reason = 'run', 200, (
+                'Result would take %.1fs to calculate' % cost)
+        elif background:
+            action, status, reason = 'background', 202, (
+                'Result would take %.1fs to calculate; more than %.1fs' % (
+                    cost, self.sync_cost))
+        else:
+            action, status, reason = 'reject', 503, (
+                'Result would take %.1fs to calculate and no background '
+                'capacity is available' % cost)
+        return Plan(
+            name, tables, cells, cell_cost, cost, action, status, reason)
@@ -33,54 +33,74 @@ except ImportError:
 import sys
 import io
 import csv
+import array
+import struct
 import pickle
+import itertools
 import tempfile
 import textwrap
 
 import xlsxwriter as xl
-import pybel
-from flask import json
+import numpy as np
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
 
-from .zip import ZipFile, ZIP_DEFLATED
-from .html import TagFactory
+from . import jsonio
+from .zip import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from .html import TagFactory, escape
+from .results import _BINARY_MIMETYPE, _BINARY_MAGIC
 
 
 _RENDERERS = {}
 
-def register(mimetype, label, headers=None):
+def register(mimetype, label, headers=None, listed=True):
+    # Renderers registered with listed=False are omitted from registered(),
+    # and thus from the formats offered to users by the web interface; they
+    # remain available to render() for content negotiation
     if headers is None:
         headers = {}
     def decorator(func):
         if mimetype in _RENDERERS:
             raise ValueError('A handler for MIME-type %s already exists' % mimetype)
-        _RENDERERS[mimetype] = (label, headers, func)
+        _RENDERERS[mimetype] = (label, headers, func, listed)
         return func
     return decorator
 
 def registered():
     return [
         (mimetype, label)
-        for (mimetype, (label, headers, func)) in _RENDERERS.items()
+        for (mimetype, (label, headers, func, listed)) in _RENDERERS.items()
+        if listed
         ]
 
 def render(mimetype, obj, **kwargs):
     try:
-        label, headers, func = _RENDERERS[mimetype]
+        label, headers, func, listed = _RENDERERS[mimetype]
     except KeyError:
         raise ValueError('Unknown MIME-type %s' % mimetype)
     else:
         return headers, func(obj, **kwargs)
 
 
-def _format_key(value):
-    # This rather hacky routine is here to deal with the crappy string
-    # conversion from OpenBabel's Molecule class
-    if isinstance(value, tuple):
-        return tuple(_format_key(key) for key in value)
-    elif isinstance(value, pybel.Molecule):
-        return str(value).strip()
-    else:
-        return value
+# The approximate number of cells in each block of rows that renderers retrieve
+# from a table at once
+BLOCK_CELLS = 10000
+
+def _row_blocks(table, cells=BLOCK_CELLS, start=0, stop=None):
+    # Renderers display keys by their labels (see Table.row_labels) rather
+    # than the raw keys; molecules are thus only converted to SMILES once
+    return table.iter_row_blocks(
+        max(1, cells // len(table.cols)), start, stop, labels=True)
+
+
+def _unwrap(labels, dims):
+    # Single dimensional keys are rendered as bare values rather than tuples
+    if dims > 1:
+        return list(labels)
+    return [label[0] for label in labels]
 
 
 @register('application/json', 'JSON file', headers={
@@ -91,6 +111,8 @@ def _format_key(value):
 def render_json(results, **kwargs):
 
     def render_table(table):
+        cols = _unwrap(table.col_labels, table.col_dims)
+        multi_row = table.row_dims > 1
         return {
             'name': table.name,
             'title': table.title,
@@ -100,15 +122,17 @@ def render_json(results, **kwargs):
             'cols_unit': table.cols_unit,
             'data': [
                 {
-                    'key': (_format_key(row_key), _format_key(col_key)),
-                    'value': table.data[(row_key, col_key)],
+                    'key': (row_json, col_json),
+                    'value': value,
                     }
-                for row_key in table.rows
-                for col_key in table.cols
+                for block in _row_blocks(table)
+                for (row_key, values) in block
+                for row_json in (row_key if multi_row else row_key[0],)
+                for (col_json, value) in zip(cols, values)
                 ]
             }
 
-    return json.dumps([render_table(table) for table in results], **kwargs)
+    return jsonio.dumps([render_table(table) for table in results], **kwargs)
 
 
 @register('application/octet-stream', 'Python pickle')
@@ -121,35 +145,111 @@ def render_pickle(results, **kwargs):
     return pickle.dumps(results, protocol=0)
 
 
+@register(_BINARY_MIMETYPE, 'Binary (for the client library)', headers={
+    'Access-Control-Allow-Origin': '*',
+    'Content-Disposition': 'attachment; filename=umansysprop.bin',
+    }, listed=False)
+def render_binary(results, **kwargs):
+    # See umansysprop.results for a description of the format. Tables of
+    # numbers are packed into a float64 buffer; anything else is included in
+    # the header as with JSON
+    header = []
+    buf = array.array(str('d'))
+    for table in results:
+        values = [
+            value
+            for block in _row_blocks(table)
+            for (row_key, row_values) in block
+            for value in row_values
+            ]
+        table_dict = {
+            'name': table.name,
+            'title': table.title,
+            'rows_title': table.rows_title,
+            'cols_title': table.cols_title,
+            'rows_unit': table.rows_unit,
+            'cols_unit': table.cols_unit,
+            'rows': _unwrap(table.row_labels, table.row_dims),
+            'cols': _unwrap(table.col_labels, table.col_dims),
+            }
+        if all(
+                isinstance(value, (int, float)) and not isinstance(value, bool)
+                for value in values):
+            table_dict['offset'] = len(buf) * buf.itemsize
+            buf.extend(values)
+        else:
+            table_dict['values'] = values
+        header.append(table_dict)
+    if sys.byteorder != 'little':
+        buf.byteswap()
+    header = jsonio.dumps(header)
+    # Pad the header so that the buffer is aligned for the reader
+    header += b' ' * (-(len(_BINARY_MAGIC) + 4 + len(header)) % 8)
+    return b''.join((
+        _BINARY_MAGIC,
+        struct.pack(str('<I'), len(header)),
+        header,
+        buf.tostring() if sys.version_info.major < 3 else buf.tobytes(),
+        ))
+
+
+def _xml_text(value):
+    # Numbers never contain characters that require escaping so skip the
+    # translation for them; they make up the bulk of any result
+    if isinstance(value, (int, float)):
+        return str(value)
+    return escape(str(value))
+
+
+# The approximate number of cells the XML renderer accumulates before yielding
+# a chunk of the document
+XML_CHUNK_CELLS = 1000
+
 @register('application/xml', 'XML file', headers={
         'Content-Disposition': 'attachment; filename=umansysprop.xml',
         })
 def render_xml(results, **kwargs):
-    tag = TagFactory(xml=True)
+    # Unlike the other renderers, this returns an iterator of document chunks
+    # so that large results can be streamed without building the whole
+    # document in memory
+
+    def render_dims(titles, units):
+        return ''.join(
+            '<dim title="%s" unit="%s"></dim>' % (_xml_text(title), _xml_text(unit))
+            for (title, unit) in zip(titles, units)
+            )
+
+    def render_keys(key):
+        return ''.join(
+            '<dim key="%s"></dim>' % _xml_text(value)
+            for value in key
+            )
 
     def render_table(table):
-        return tag.table(
-            tag.cols(
-                tag.dim(title=title, unit=unit)
-                for (title, unit) in zip(table.col_titles, table.col_units)
-                ),
-            tag.rows(
-                tag.dim(title=title, unit=unit)
-                for (title, unit) in zip(table.row_titles, table.row_units)
-                ),
-            tag.data(
-                tag.datum(
-                    tag.row(tag.dim(key=key) for key in row_key),
-                    tag.col(tag.dim(key=key) for key in col_key),
-                    value
-                    )
-                for row_key, col_key, value in table.data_iter
-                ),
-            title=table.title,
-            name=table.name,
+        yield '<table title="%s" name="%s"><cols>%s</cols><rows>%s</rows><data>' % (
+            _xml_text(table.title),
+            _xml_text(table.name),
+            render_dims(table.col_titles, table.col_units),
+            render_dims(table.row_titles, table.row_units),
             )
+        cols = [
+            '<col>%s</col>' % render_keys(col_tuple)
+            for col_tuple in table.col_labels
+            ]
+        for block in _row_blocks(table, XML_CHUNK_CELLS):
+            yield ''.join(
+                '%s%s%s</datum>' % (row, col, _xml_text(value))
+                for (row_tuple, values) in block
+                for row in ('<datum><row>%s</row>' % render_keys(row_tuple),)
+                for (col, value) in zip(cols, values)
+                )
+        yield '</data></table>'
 
-    return tag.tables(render_table(table) for table in results)
+    yield '<tables>'
+    for table in results:
+        for chunk in render_table(table):
+            yield chunk
+    yield '</tables>'
 
 
 @register('application/zip', 'Zipped CSV files', headers={
@@ -167,13 +267,14 @@ def render_csv(results, **kwargs):
         for dim in range(table.col_dims):
             writer.writerow(
                 [''] * table.row_dims +
-                [_format_key(col_key[dim]) for col_key in table.cols_iter]
-                )
-        for data_row, row_keys in zip(table.rows, table.rows_iter):
-            writer.writerow(
-                [_format_key(row_key) for row_key in row_keys] +
-                [table.data[(data_row, data_col)] for data_col in table.cols]
+                [col_key[dim] for col_key in table.col_labels]
                 )
+        for block in _row_blocks(table):
+            for row_keys, values in block:
+                writer.writerow(
+                    list(row_keys) +
+                    list(values)
+                    )
         stream.seek(0)
         return stream
 
@@ -214,6 +315,257 @@ structure of their rows and columns.
         return stream.getvalue()
 
 
+def _npy_array(values):
+    # Convert a list of values (or keys) to an array which can be saved
+    # without pickling; anything which isn't numeric becomes a unicode string
+    a = np.array(values)
+    if a.dtype.kind not in 'biufU':
+        return a.astype(str)
+    return a
+
+
+def _npy_keys(labels, dims):
+    # Multi-dimensional keys become a record array with a field per dimension
+    if dims > 1:
+        return np.rec.fromarrays([
+            _npy_array([label[dim] for label in labels])
+            for dim in range(dims)
+            ])
+    return _npy_array([label[0] for label in labels])
+
+
+@register('application/x-npz', 'NumPy arrays (.npz)', headers={
+        'Content-Disposition': 'attachment; filename=umansysprop.npz',
+        })
+def render_npz(results, **kwargs):
+    # Each table is stored as three arrays: <name>.values, <name>.rows, and
+    # <name>.cols, alongside a metadata.json entry describing the tables.
+    # Arrays are stored uncompressed so that they can be memory-mapped in
+    # place; numpy.load can't do that for .npz archives, so Result.from_npz
+    # is provided to load them
+    def render_array(a):
+        stream = io.BytesIO()
+        np.lib.format.write_array(stream, a, allow_pickle=False)
+        return stream.getvalue()
+
+    metadata = [
+        {
+            'name': table.name,
+            'title': table.title,
+            'rows_title': table.rows_title,
+            'cols_title': table.cols_title,
+            'rows_unit': table.rows_unit,
+            'cols_unit': table.cols_unit,
+            'row_dims': table.row_dims,
+            'col_dims': table.col_dims,
+            }
+        for table in results
+        ]
+    with io.BytesIO() as stream:
+        with ZipFile(stream, 'w', compression=ZIP_STORED) as archive:
+            for table in results:
+                values = _npy_array([
+                    list(row_values)
+                    for block in _row_blocks(table)
+                    for (row_key, row_values) in block
+                    ])
+                if values.dtype.kind in 'biu':
+                    # Match the type of Table.as_ndarray
+                    values = values.astype(np.float64)
+                archive.writestr(
+                    '%s.values.npy' % table.name, render_array(values))
+                archive.writestr('%s.rows.npy' % table.name, render_array(
+                    _npy_keys(table.row_labels, table.row_dims)))
+                archive.writestr('%s.cols.npy' % table.name, render_array(
+                    _npy_keys(table.col_labels, table.col_dims)))
+            archive.writestr('metadata.json', jsonio.dumps(metadata))
+        return stream.getvalue()
+
+
+class _StreamSink(io.RawIOBase):
+    # An unseekable file-like object which accumulates whatever is written to
+    # it until collected by take(). This permits renderers to yield chunks of
+    # an archive while it is being written
+    def __init__(self):
+        super(_StreamSink, self).__init__()
+        self._chunks = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def take(self):
+        result = b''.join(self._chunks)
+        self._chunks = []
+        return result
+
+
+# The approximate number of cells in each record batch written by the Arrow
+# and Parquet renderers
+ARROW_BATCH_CELLS = 65536
+
+def _arrow_keys(labels, dims):
+    # Convert a sequence of key labels into an Arrow array per dimension;
+    # dimensions of mixed type are converted to strings
+    result = []
+    for dim in range(dims):
+        values = [label[dim] for label in labels]
+        try:
+            result.append(pa.array(values))
+        except (pa.ArrowException, TypeError, ValueError):
+            result.append(pa.array([str(value) for value in values]))
+    return result
+
+
+def _arrow_fields(prefix, titles, units, arrays, names):
+    # Name each key field after its title, falling back to prefix and the
+    # dimension number for titles which are blank or already used
+    fields = []
+    for dim, (title, unit, array) in enumerate(zip(titles, units, arrays)):
+        name = title if title and title not in names else '%s%d' % (prefix, dim)
+        names.add(name)
+        fields.append(pa.field(name, array.type, metadata={
+            'title': title,
+            'unit': unit,
+            }))
+    return fields
+
+
+def _arrow_value_type(values):
+    # Infer the type of the value column from the values of the first block
+    # of rows. Integers (and blocks entirely of nulls) are stored as float64
+    # to match the type of Table.as_ndarray, and blocks of mixed types as
+    # strings
+    try:
+        value_type = pa.array(values).type
+    except (pa.ArrowException, TypeError, ValueError):
+        return pa.string()
+    if pa.types.is_integer(value_type) or pa.types.is_null(value_type):
+        return pa.float64()
+    return value_type
+
+
+def _arrow_values(values, value_type):
+    # Convert a block of values to an array of the value column's type. A
+    # download has already begun by the time later blocks are calculated, so
+    # values which don't fit the type inferred from the first block (e.g.
+    # placeholder strings in a numeric column) mustn't abort it; they're
+    # converted to strings in a string column, and are null otherwise
+    try:
+        return pa.array(values, type=value_type)
+    except (pa.ArrowException, TypeError, ValueError):
+        pass
+    if pa.types.is_string(value_type):
+        return pa.array([
+            None if value is None else str(value)
+            for value in values
+            ], type=value_type)
+    converted = []
+    for value in values:
+        try:
+            pa.array([value], type=value_type)
+        except (pa.ArrowException, TypeError, ValueError):
+            value = None
+        converted.append(value)
+    return pa.array(converted, type=value_type)
+
+
+def _arrow_batches(table):
+    # Generate the long-format representation of table, with a column per row
+    # key dimension, a column per column key dimension, and a value column, as
+    # a schema followed by a record batch for each block of rows
+    row_keys = _arrow_keys(table.row_labels, table.row_dims)
+    col_keys = _arrow_keys(table.col_labels, table.col_dims)
+    cols = len(table.cols)
+    block = max(1, ARROW_BATCH_CELLS // cols)
+    blocks = table.iter_row_blocks(block)
+    first = next(blocks)
+    value_type = _arrow_value_type([
+        value
+        for (row_key, values) in first
+        for value in values
+        ])
+    names = {'value'}
+    schema = pa.schema(
+        _arrow_fields('row', table.row_titles, table.row_units, row_keys, names) +
+        _arrow_fields('col', table.col_titles, table.col_units, col_keys, names) +
+        [pa.field('value', value_type)],
+        metadata={'umansysprop': jsonio.dumps({
+            'name': table.name,
+            'title': table.title,
+            'rows_title': table.rows_title,
+            'cols_title': table.cols_title,
+            'rows_unit': table.rows_unit,
+            'cols_unit': table.cols_unit,
+            })})
+    yield schema
+    col_index = pa.array(np.tile(np.arange(cols), block))
+    start = 0
+    for rows in itertools.chain([first], blocks):
+        row_index = pa.array(np.repeat(np.arange(start, start + len(rows)), cols))
+        col_block = col_index.slice(0, len(rows) * cols)
+        yield pa.record_batch(
+            [key.take(row_index) for key in row_keys] +
+            [key.take(col_block) for key in col_keys] +
+            [_arrow_values([
+                value
+                for (row_key, values) in rows
+                for value in values
+                ], value_type)],
+            schema=schema)
+        start += len(rows)
+
+
+def _render_arrow_archive(results, extension, writer):
+    # Write each table in results to a member of a zip archive with the
+    # writer specified, yielding the archive as each record batch is written.
+    # The writer is closed even if this is abandoned part way through (e.g.
+    # because the client disconnected) so that it doesn't later try to write
+    # to the closed member
+    sink = _StreamSink()
+    with ZipFile(sink, 'w', compression=ZIP_STORED) as archive:
+        for table in results:
+            batches = _arrow_batches(table)
+            schema = next(batches)
+            with archive.open(
+                    '%s.%s' % (table.name, extension), 'w',
+                    force_zip64=True) as member:
+                table_writer = writer(member, schema)
+                try:
+                    for batch in batches:
+                        table_writer.write_batch(batch)
+                        yield sink.take()
+                finally:
+                    table_writer.close()
+    yield sink.take()
+
+
+if pa is not None:
+    # Each table becomes a separate Arrow IPC stream or Parquet file (as each
+    # has a different schema) within a zip archive. Like render_xml, these
+    # return an iterator of chunks of the archive
+
+    @register('application/vnd.apache.arrow.stream+zip', 'Zipped Arrow IPC streams', headers={
+            'Content-Disposition': 'attachment; filename=umansysprop-arrow.zip',
+            })
+    def render_arrow(results, **kwargs):
+        return _render_arrow_archive(results, 'arrows', pa.ipc.new_stream)
+
+    @register('application/vnd.apache.parquet+zip', 'Zipped Parquet files', headers={
+            'Content-Disposition': 'attachment; filename=umansysprop-parquet.zip',
+            })
+    def render_parquet(results, **kwargs):
+        return _render_arrow_archive(results, 'parquet', pq.ParquetWriter)
+
+
 @register('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'Excel file', headers={
         'Content-Disposition': 'attachment; filename=umansysprop.xlsx',
         })
@@ -251,38 +603,41 @@ def render_xlsx(results, **kwargs):
                 table.col_dims + 2, col_ix, '%s [%s]' % (title, unit) if unit else title,
                 row_title_f)
         # Write column keys
-        for col_ix, col_key in enumerate(table.cols_iter, start=table.row_dims):
-            span = table.col_spans[col_key]
+        col_spans = table.col_spans
+        for col_ix, col_key in enumerate(table.col_labels, start=table.row_dims):
+            span = col_spans.at(col_ix - table.row_dims)
             for col_dim in range(table.col_dims):
                 if span[col_dim] > 1:
                     worksheet.merge_range(
                         col_dim + 3, col_ix,
                         col_dim + 3, col_ix + span[col_dim] - 1,
-                        _format_key(col_key[col_dim]),
+                        col_key[col_dim],
                         first_col_title_f if col_ix == table.row_dims else None)
                 elif span[col_dim] == 1:
                     worksheet.write(
                         col_dim + 3, col_ix,
-                        _format_key(col_key[col_dim]),
+                        col_key[col_dim],
                         first_col_title_f if col_ix == table.row_dims else None)
         # Write row keys
-        for row_ix, row_key in enumerate(table.rows_iter, start=table.col_dims + 3):
-            span = table.row_spans[row_key]
+        row_spans = table.row_spans
+        for row_ix, row_key in enumerate(table.row_labels, start=table.col_dims + 3):
+            span = row_spans.at(row_ix - table.col_dims - 3)
             for row_dim in range(table.row_dims):
                 if span[row_dim] > 1:
                     worksheet.merge_range(
                         row_ix, row_dim,
                         row_ix + span[row_dim] - 1, row_dim,
-                        _format_key(row_key[row_dim]))
+                        row_key[row_dim])
                 elif span[row_dim] == 1:
                     worksheet.write(
                         row_ix, row_dim,
-                        _format_key(row_key[row_dim]))
+                        row_key[row_dim])
         # Write data
-        for row_ix, row_key in enumerate(table.rows, start=table.col_dims + 3):
-            for col_ix, col_key in enumerate(table.cols, start=table.row_dims):
+        rows = (row for block in _row_blocks(table) for row in block)
+        for row_ix, (row_key, values) in enumerate(rows, start=table.col_dims + 3):
+            for col_ix, value in enumerate(values, start=table.row_dims):
                 worksheet.write(
-                    row_ix, col_ix, table.data[(row_key, col_key)],
+                    row_ix, col_ix, value,
                     first_data_f if (row_ix, col_ix) == (table.col_dims + 3, table.row_dims) else
                     col_key_f if row_ix == table.col_dims + 3 else
                     row_key_f if col_ix == table.row_dims else
@@ -295,8 +650,60 @@ def render_xlsx(results, **kwargs):
     return stream.getvalue()
 
 
+def render_html_rows(table, start=0, stop=None, rows_url=None):
+    """
+    Renders the rows of *table* from *start* up to (but excluding) *stop* as
+    an HTML ``<tbody>`` element. Row headers spanning several rows are
+    clipped to the range rendered, and a header whose span began before
+    *start* is repeated with the remainder of its span, so each range of rows
+    renders correctly by itself.
+
+    If *rows_url* is specified it must be a callable accepting a table and a
+    starting row index and returning the URL from which the rows from that
+    index onwards can be retrieved. If rows remain after *stop*, this URL is
+    included in the ``data-next`` attribute of the element.
+    """
+    tag = TagFactory(xml=False)
+    count = len(table.rows)
+    if stop is None or stop > count:
+        stop = count
+
+    row_spans = table.row_spans
+
+    def row_span(i, dim):
+        run_start, run_stop = row_spans.run(i, dim)
+        if run_start != i and i != start:
+            # Within a span which began on an earlier row; note that a span
+            # which began before this range is repeated at its start
+            return 0
+        return min(run_stop, stop) - i
+
+    return tag.tbody(
+        (
+            tag.tr(
+                (
+                    tag.th(row_key[row_dim], rowspan=span if span > 1 else None)
+                    for row_dim in range(table.row_dims)
+                    for span in (row_span(i, row_dim),)
+                    if span > 0
+                    ),
+                (tag.td(value) for value in values)
+                )
+            for i, (row_key, values) in enumerate((
+                row
+                for block in _row_blocks(table, start=start, stop=stop)
+                for row in block
+                ), start)
+            ),
+        data_next=rows_url(table, stop)
+            if rows_url is not None and stop < count else None,
+        )
+
+
 @register('text/html', 'HTML (view in web browser)')
-def render_html(obj, **kwargs):
+def render_html(obj, page_rows=None, rows_url=None, **kwargs):
+    # If page_rows is specified, only that many rows of each table are
+    # rendered; see render_html_rows for the meaning of rows_url
     tag = TagFactory(xml=False)
 
     def render_table(table):
@@ -305,7 +712,7 @@ def render_html(obj, **kwargs):
             for (title, unit) in zip(table.col_titles, table.col_units)
             )
         return tag.table(
-            tag.caption(obj['tables'][table_id]['title']),
+            tag.caption(table.title),
             tag.thead(
                 tag.tr(
                     (tag.th('') for i in range(table.row_dims)),
@@ -320,32 +727,17 @@ def render_html(obj, **kwargs):
                             for (row_title, row_unit) in zip(table.row_titles, table.row_units)
                             ),
                         (
-                            tag.th(_format_key(key[col_dim]), colspan=span if span > 1 else None)
-                            for key in table.cols_iter
-                            for span in (table.col_spans[key][col_dim],)
+                            tag.th(key[col_dim], colspan=span if span > 1 else None)
+                            for i, key in enumerate(table.col_labels)
+                            for span in (table.col_spans.at(i)[col_dim],)
                             if span > 0
                             )
                         )
                     for col_dim in range(table.col_dims)
                     )
                 ),
-            tag.tbody(
-                tag.tr(
-                    (
-                        tag.th(_format_key(row_key[row_dim]), rowspan=span if span > 1 else None)
-                        for row_dim in range(table.row_dims)
-                        for span in (table.row_spans[row_key][row_dim],)
-                        if span > 0
-                        ),
-                    (
-                        tag.td(table.data[(data_row, data_col)])
-                        for (data_col, col_key) in zip(table.cols, table.cols_iter)
-                        )
-                    )
-                for (data_row, row_key) in zip(table.rows, table.rows_iter)
-                ),
+            render_html_rows(table, 0, page_rows, rows_url),
             id=table.name,
             )
 
-    return tag.div(render_table(table_id) for table_id in obj['tables'])
-
+    return tag.div(render_table(table) for table in obj)
@@ -36,6 +36,20 @@ Table
 =====
 
 .. autoclass:: Table
+
+Memo
+====
+
+.. autoclass:: Memo
+
+EvaluationContext
+=================
+
+.. autoclass:: EvaluationContext
+
+.. autoexception:: Cancelled
+
+.. autoexception:: DeadlineExceeded
 """
 
 from __future__ import (
@@ -47,9 +61,284 @@ from __future__ import (
 str = type('')
 
 
+import io
 import sys
-import json
+import time
+import array
+import struct
+import bisect
+import weakref
+import zipfile
 import itertools
+import threading
+from collections import OrderedDict
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping
+
+from . import jsonio
+
+
+# The MIME-type and leading signature of the binary result format produced by
+# umansysprop.renderers.render_binary. The format consists of the signature,
+# the length of a header as a little-endian unsigned 32-bit integer, the
+# header itself (UTF-8 encoded JSON, padded so that the following buffer is
+# aligned to 8 bytes), and finally a buffer of little-endian float64 values.
+# The header is a list of tables each of which has the same structure as
+# render_json's output except that "data" is replaced by "rows" and "cols"
+# (lists of keys) and either "offset" (of the table's values in row-major
+# order within the buffer) or "values" (a row-major list of values, for tables
+# with non-numeric values)
+_BINARY_MIMETYPE = 'application/vnd.umansysprop.result'
+_BINARY_MAGIC = b'UMSPRES1'
+
+
+# The display labels of molecules, which are expensive to derive
+_molecule_labels = weakref.WeakKeyDictionary()
+
+def _label(value):
+    # Returns the display label of a key element. Molecules are labelled with
+    # their SMILES representation. The client doesn't require pybel, but if
+    # it hasn't been imported there can't be any molecules to label
+    pybel = sys.modules.get('pybel')
+    if pybel is not None and isinstance(value, pybel.Molecule):
+        try:
+            return _molecule_labels[value]
+        except KeyError:
+            label = _molecule_labels[value] = str(value).strip()
+            return label
+    return value
+
+
+# The number of rows in each chunk of a table's cache of calculated values,
+# and the marker for cells within a chunk that haven't been calculated yet
+CHUNK_ROWS = 64
+_PENDING = object()
+
+
+def _to_tuple(v):
+    if isinstance(v, list):
+        return tuple(v)
+    else:
+        return v
+
+
+class Cancelled(Exception):
+    """
+    Raised when the evaluation of a table is abandoned because its
+    :class:`EvaluationContext` was cancelled.
+    """
+
+
+class DeadlineExceeded(Cancelled):
+    """
+    Raised when the evaluation of a table is abandoned because its
+    :class:`EvaluationContext` passed its deadline.
+    """
+
+
+_local = threading.local()
+
+
+class EvaluationContext(object):
+    """
+    Governs the evaluation of tables within the current thread. Tables check
+    the context after calculating each row, reporting their progress and
+    abandoning the calculation by raising :exc:`Cancelled` (or
+    :exc:`DeadlineExceeded`) if the context has been cancelled or has passed
+    its deadline. The context is active within a :keyword:`with` block::
+
+        with EvaluationContext(timeout=60) as context:
+            result = handler(**args)
+            context.total = sum(len(t.rows) * len(t.cols) for t in result)
+            output = renderers.render(mimetype, result)
+
+    The *deadline* parameter gives the time (as returned by
+    :func:`time.time`) after which evaluation is abandoned; alternatively
+    *timeout* gives the number of seconds from now. If *progress* is given, it
+    is called with :attr:`done` and :attr:`total` after each row is
+    calculated. Contexts may be nested, in which case the inner context is
+    also abandoned when the outer one is.
+
+    Since tables are evaluated lazily, the context must be active whenever a
+    table's values are accessed, e.g. when a result is rendered, rather than
+    merely while it is constructed.
+
+    .. attribute:: done
+
+        The number of cells calculated within the context.
+
+    .. attribute:: total
+
+        The number of cells expected to be calculated within the context, if
+        known (otherwise :data:`None`). This is only used for reporting
+        progress.
+
+    .. automethod:: cancel
+
+    .. automethod:: check
+
+    .. automethod:: current
+    """
+
+    def __init__(self, deadline=None, timeout=None, progress=None):
+        if timeout is not None:
+            timeout_deadline = time.time() + timeout
+            if deadline is None or timeout_deadline < deadline:
+                deadline = timeout_deadline
+        self.deadline = deadline
+        self.progress = progress
+        self.done = 0
+        self.total = None
+        self._cancelled = False
+        self._parent = None
+
+    def __enter__(self):
+        self._parent = getattr(_local, 'context', None)
+        _local.context = self
+        return self
+
+    def __exit__(self, *exc):
+        _local.context = self._parent
+        self._parent = None
+
+    @staticmethod
+    def current():
+        """
+        Returns the context active in the current thread, or :data:`None` if
+        there is no active context. Handlers which perform lengthy
+        calculations outside of tables can use this to :meth:`check` the
+        context themselves.
+        """
+        return getattr(_local, 'context', None)
+
+    @property
+    def cancelled(self):
+        """
+        Returns :data:`True` if the context (or a context it is nested within)
+        has been cancelled.
+        """
+        return self._cancelled or (
+            self._parent is not None and self._parent.cancelled)
+
+    def cancel(self):
+        """
+        Cancels the context. This may be called from any thread; evaluation
+        within the context is abandoned when it next checks the context.
+        """
+        self._cancelled = True
+
+    def check(self):
+        """
+        Raises :exc:`Cancelled` if the context has been cancelled, or
+        :exc:`DeadlineExceeded` if it has passed its deadline.
+        """
+        if self._cancelled:
+            raise Cancelled('Evaluation cancelled')
+        if self.deadline is not None and time.time() > self.deadline:
+            raise DeadlineExceeded('Evaluation exceeded its deadline')
+        if self._parent is not None:
+            self._parent.check()
+
+    def _advance(self, cells):
+        # Called by tables after calculating cells; progress is also reported
+        # to the contexts this is nested within
+        self.done += cells
+        if self.progress is not None:
+            self.progress(self.done, self.total)
+        if self._parent is not None:
+            self._parent._advance(cells)
+        self.check()
+
+
+class Memo(object):
+    """
+    A thread-safe store of the results of function calls, intended to be
+    shared by the functions of the tables in a :class:`Result` (see
+    :attr:`Result.memo`) so that intermediate values common to several tables
+    are only calculated once. Calling the instance with a function and its
+    arguments returns the function's result, calling it only if it hasn't been
+    called with the same arguments before::
+
+        def handler(temperatures, compounds):
+            result = Result()
+            contributions = result.memo.wrap(group_contributions)
+            result.extend([
+                Table(
+                    'vapour_pressure', rows=compounds, cols=temperatures,
+                    func=lambda c, t: vapour_pressure(contributions(c), t)),
+                Table(
+                    'enthalpy', rows=compounds, cols=temperatures,
+                    func=lambda c, t: enthalpy(contributions(c), t)),
+                ])
+            return result
+
+    The arguments must be hashable. At most *max_size* results (default
+    10000) are retained; when this is exceeded the least recently used are
+    discarded. The :attr:`hits` and :attr:`misses` attributes count the calls
+    which were, and were not, answered from the memo.
+
+    .. automethod:: wrap
+
+    .. automethod:: clear
+    """
+
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def __call__(self, func, *args):
+        key = (func, args)
+        with self._lock:
+            try:
+                value = self._results.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                # Re-insert the value to mark it as most recently used
+                self._results[key] = value
+                self.hits += 1
+                return value
+        # The function is called without holding the lock so that other
+        # threads are not held up by it; a concurrent call with the same
+        # arguments may therefore calculate the value twice
+        value = func(*args)
+        with self._lock:
+            self._results[key] = value
+            while len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+        return value
+
+    def __len__(self):
+        with self._lock:
+            return len(self._results)
+
+    def __repr__(self):
+        return '<Memo size=%d hits=%d misses=%d>' % (
+            len(self), self.hits, self.misses)
+
+    def wrap(self, func):
+        """
+        Returns a function which calls *func* via the memo.
+        """
+        def wrapper(*args):
+            return self(func, *args)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def clear(self):
+        """
+        Discards all stored results and resets the statistics.
+        """
+        with self._lock:
+            self._results.clear()
+            self.hits = 0
+            self.misses = 0
 
 
 class Result(list):
@@ -61,14 +350,44 @@ class Result(list):
     name, or by index in the list (tables with identical names are not ignored,
     but only the first table may be retrieved by name).
 
+    Tables whose functions share expensive intermediate calculations can
+    share them through the :class:`Memo` in the :attr:`memo` attribute. A
+    particular memo (for instance, one with a different size) can be given
+    with the *memo* keyword parameter.
+
+    .. autoattribute:: memo
+
     .. note::
 
         This class has an extended string representation intended for easy
         command line debugging. Simply print an instance of the class to view a
         dump of all the tables contained within it.
     """
-    def __init__(self, *tables):
+    __slots__ = ('_names', '_memo')
+
+    def __init__(self, *tables, **kwargs):
+        memo = kwargs.pop('memo', None)
+        if kwargs:
+            raise TypeError(
+                'unexpected keyword argument %r' % next(iter(kwargs)))
         super(Result, self).__init__(tables)
+        self._names = None
+        self._memo = memo
+
+    def __reduce__(self):
+        # The memo is only of use while the tables are being evaluated, and
+        # isn't stored
+        return (self.__class__, tuple(self))
+
+    @property
+    def memo(self):
+        """
+        The :class:`Memo` shared by the tables of the result, which is created
+        when first required.
+        """
+        if self._memo is None:
+            self._memo = Memo()
+        return self._memo
 
     @classmethod
     def from_json(cls, obj):
@@ -76,45 +395,206 @@ class Result(list):
         This class constructor accepts a parsed JSON object (created by
         :func:`umansysprop.renderers.render_json`, or with the same structure
         produced by that function) and constructs the :class:`Result` from this
-        structure.
+        structure. The unparsed JSON may also be given as a :class:`str` or
+        UTF-8 encoded :class:`bytes` string, in which case it is parsed with
+        :func:`umansysprop.jsonio.loads`.
         """
-        def to_tuple(v):
-            if isinstance(v, list):
-                return tuple(v)
-            else:
-                return v
-
+        if isinstance(obj, (bytes, str)):
+            obj = jsonio.loads(obj)
         tables = []
         for table_dict in obj:
             name = table_dict['name']
             title = table_dict['title']
-            rows_title = to_tuple(table_dict['rows_title'])
-            rows_unit = to_tuple(table_dict['rows_unit'])
-            cols_title = to_tuple(table_dict['cols_title'])
-            cols_unit = to_tuple(table_dict['cols_unit'])
-            rows = []
-            cols = []
+            rows_title = _to_tuple(table_dict['rows_title'])
+            rows_unit = _to_tuple(table_dict['rows_unit'])
+            cols_title = _to_tuple(table_dict['cols_title'])
+            cols_unit = _to_tuple(table_dict['cols_unit'])
+            # Keys are assembled in order of first appearance; the dicts
+            # (whose values are unused) make the membership tests cheap
+            rows = OrderedDict()
+            cols = OrderedDict()
             data = {}
             for datum in table_dict['data']:
-                key = datum['key']
-                value = datum['value']
-                row_key, col_key = (to_tuple(v) for v in key)
+                row_key, col_key = datum['key']
+                if isinstance(row_key, list):
+                    row_key = tuple(row_key)
+                if isinstance(col_key, list):
+                    col_key = tuple(col_key)
                 if row_key not in rows:
-                    rows.append(row_key)
+                    rows[row_key] = None
                 if col_key not in cols:
-                    cols.append(col_key)
-                data[(row_key, col_key)] = value
+                    cols[col_key] = None
+                data[(row_key, col_key)] = datum['value']
             tables.append(Table(
-                name, rows, cols, data=data, title=title,
+                name, rows, cols,
+                data=data, title=title,
                 rows_title=rows_title, rows_unit=rows_unit,
                 cols_title=cols_title, cols_unit=cols_unit))
         return cls(*tables)
 
+    @classmethod
+    def from_binary(cls, data):
+        """
+        This class constructor accepts a :class:`bytes` string in the binary
+        format produced by :func:`umansysprop.renderers.render_binary` and
+        constructs the :class:`Result` from it. The values of each numeric
+        table are a `numpy`_ array which shares memory with *data* (which is
+        therefore kept alive by the result).
+
+        .. warning::
+
+            This method will implicitly import the numpy module.
+
+        .. _numpy: http://www.numpy.org/
+        """
+        import numpy as np
+        if data[:len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+            raise ValueError('Data is not a binary result')
+        start = len(_BINARY_MAGIC)
+        (size,) = struct.unpack_from('<I', data, start)
+        start += 4
+        header = jsonio.loads(data[start:start + size])
+        start += size
+        tables = []
+        for table_dict in header:
+            rows = [_to_tuple(key) for key in table_dict['rows']]
+            cols = [_to_tuple(key) for key in table_dict['cols']]
+            if 'offset' in table_dict:
+                values = np.frombuffer(
+                    data, dtype='<f8', count=len(rows) * len(cols),
+                    offset=start + table_dict['offset'],
+                    ).reshape(len(rows), len(cols))
+            else:
+                values = [
+                    table_dict['values'][i:i + len(cols)]
+                    for i in range(0, len(rows) * len(cols), len(cols))
+                    ]
+            tables.append(Table(
+                table_dict['name'], rows, cols, values=values,
+                title=table_dict['title'],
+                rows_title=_to_tuple(table_dict['rows_title']),
+                rows_unit=_to_tuple(table_dict['rows_unit']),
+                cols_title=_to_tuple(table_dict['cols_title']),
+                cols_unit=_to_tuple(table_dict['cols_unit'])))
+        return cls(*tables)
+
+    @classmethod
+    def from_npz(cls, filename, mmap_mode='r'):
+        """
+        This class constructor accepts the *filename* of an archive produced
+        by :func:`umansysprop.renderers.render_npz` and constructs the
+        :class:`Result` from it. The values of each table are a `numpy`_
+        array memory-mapped from the archive in place, with the *mmap_mode*
+        given (``'r'``, ``'r+'``, or ``'c'``, as for :class:`numpy.memmap`),
+        so only those values which are accessed are read. If *mmap_mode* is
+        :data:`None` the values are read into memory instead, as they are for
+        archives whose members were compressed by something other than the
+        server.
+
+        This is equivalent to :func:`numpy.load` with the same *mmap_mode*
+        for each member of the archive, which :func:`numpy.load` itself does
+        not support for ``.npz`` files.
+
+        .. warning::
+
+            This method will implicitly import the numpy module.
+
+        .. _numpy: http://www.numpy.org/
+        """
+        import numpy as np
+        if mmap_mode not in (None, 'r', 'r+', 'c'):
+            raise ValueError('Invalid mmap_mode %r' % mmap_mode)
+
+        def load_array(archive, member):
+            info = archive.getinfo(member)
+            if mmap_mode is None or info.compress_type != zipfile.ZIP_STORED:
+                return np.lib.format.read_array(
+                    io.BytesIO(archive.read(info)), allow_pickle=False)
+            # The member's data follows its local header, whose extra field
+            # may differ in length from that in the central directory
+            with io.open(filename, 'rb') as f:
+                f.seek(info.header_offset)
+                header = f.read(30)
+                if header[:4] != b'PK\x03\x04':
+                    raise ValueError('Bad local header for %s' % member)
+                name_size, extra_size = struct.unpack('<HH', header[26:30])
+                f.seek(info.header_offset + 30 + name_size + extra_size)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    read_header = np.lib.format.read_array_header_1_0
+                else:
+                    read_header = np.lib.format.read_array_header_2_0
+                shape, fortran_order, dtype = read_header(f)
+                offset = f.tell()
+            if dtype.hasobject:
+                raise ValueError('%s contains Python objects' % member)
+            return np.memmap(
+                filename, dtype=dtype, mode=mmap_mode, offset=offset,
+                shape=shape, order='F' if fortran_order else 'C')
+
+        def load_keys(archive, member):
+            # Keys of several dimensions are stored as a record array
+            keys = load_array(archive, member)
+            if keys.dtype.names:
+                return [tuple(key) for key in keys.tolist()]
+            return keys.tolist()
+
+        tables = []
+        with zipfile.ZipFile(filename) as archive:
+            for table_dict in jsonio.loads(archive.read('metadata.json')):
+                name = table_dict['name']
+                tables.append(Table(
+                    name,
+                    load_keys(archive, '%s.rows.npy' % name),
+                    load_keys(archive, '%s.cols.npy' % name),
+                    values=load_array(archive, '%s.values.npy' % name),
+                    title=table_dict['title'],
+                    rows_title=_to_tuple(table_dict['rows_title']),
+                    rows_unit=_to_tuple(table_dict['rows_unit']),
+                    cols_title=_to_tuple(table_dict['cols_title']),
+                    cols_unit=_to_tuple(table_dict['cols_unit'])))
+        return cls(*tables)
+
     def __getattr__(self, name):
-        for table in self:
-            if table.name == name:
-                return table
-        return super(Result, self).__getattr__(name)
+        # Only called when normal attribute lookup fails, which includes the
+        # slots when they haven't been set, e.g. when this was unpickled from a
+        # prior version
+        if name in self.__slots__:
+            setattr(self, name, None)
+            return None
+        if self._names is None:
+            self._names = {}
+            for table in self:
+                self._names.setdefault(table.name, table)
+        try:
+            return self._names[name]
+        except KeyError:
+            raise AttributeError(
+                '%r object has no attribute %r' % (self.__class__.__name__, name))
+
+    def _invalidate(method):
+        # Wrap a list method which modifies the list to discard the index of
+        # table names
+        def wrapper(self, *args, **kwargs):
+            self._names = None
+            return method(self, *args, **kwargs)
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+
+    __setitem__ = _invalidate(list.__setitem__)
+    __delitem__ = _invalidate(list.__delitem__)
+    __iadd__ = _invalidate(list.__iadd__)
+    append = _invalidate(list.append)
+    extend = _invalidate(list.extend)
+    insert = _invalidate(list.insert)
+    pop = _invalidate(list.pop)
+    remove = _invalidate(list.remove)
+    reverse = _invalidate(list.reverse)
+    sort = _invalidate(list.sort)
+    if hasattr(list, 'clear'):
+        clear = _invalidate(list.clear)
+    del _invalidate
 
     def __str__(self):
         return '\n'.join(
@@ -130,6 +610,59 @@ class Result(list):
             )
 
 
+class _Spans(Mapping):
+    # The spans of a sequence of key tuples (see Table.row_spans). Each
+    # dimension is stored as an array of the indexes at which runs of equal
+    # key elements start (with a final entry giving the number of keys), so
+    # the span of a key is the length of its run if it starts one, or zero.
+    # Single dimension keys never span, so nothing is stored for them
+    def __init__(self, keys, dims):
+        if not keys:
+            raise ValueError('keys cannot be empty')
+        self._keys = keys
+        self._index = None
+        if dims > 1:
+            self._starts = []
+            for dim in range(dims):
+                starts = array.array(str('l'), [0])
+                last = keys[0][dim]
+                for i, key in enumerate(keys):
+                    if key[dim] != last:
+                        starts.append(i)
+                        last = key[dim]
+                starts.append(len(keys))
+                self._starts.append(starts)
+        else:
+            self._starts = None
+
+    def run(self, index, dim):
+        if self._starts is None:
+            return index, index + 1
+        starts = self._starts[dim]
+        j = bisect.bisect_right(starts, index) - 1
+        return starts[j], starts[j + 1]
+
+    def at(self, index):
+        if self._starts is None:
+            return (1,)
+        return tuple(
+            stop - start if start == index else 0
+            for dim in range(len(self._starts))
+            for (start, stop) in (self.run(index, dim),)
+            )
+
+    def __getitem__(self, key):
+        if self._index is None:
+            self._index = {k: i for i, k in enumerate(self._keys)}
+        return self.at(self._index[key])
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+
 class Table(object):
     """
     Represents a single table in a :class:`Result`.
@@ -145,6 +678,18 @@ class Table(object):
     calculating anything. Calculated data is cached on the assumption that such
     calculations are expensive.
 
+    Cells are only calculated when their values are first required. Methods
+    such as :meth:`cell` and :meth:`iter_row_blocks` calculate just the cells
+    they return, caching them in chunks of :data:`CHUNK_ROWS` rows, while
+    :attr:`data` and :attr:`as_ndarray` calculate the entire table. A portion
+    of the table can be extracted as another table with :meth:`select`
+    without calculating anything.
+
+    Alternatively, the data can be given as a *data* dict keyed by
+    `(row_key, col_key)` tuples, or as *values*, a sequence of rows of values
+    (such as a two-dimensional numpy array) in the order of :attr:`rows` and
+    :attr:`cols`.
+
     The row and column keys can be any immutable value (immutability is
     required as they will form keys in a dict at evaluation time). Keys which
     are tuples will be treated specially as renderers. For example, if each
@@ -185,8 +730,14 @@ class Table(object):
 
     .. autoattribute:: as_dataframe
 
+    .. automethod:: cell
+
     .. autoattribute:: col_dims
 
+    .. autoattribute:: col_keys
+
+    .. autoattribute:: col_labels
+
     .. autoattribute:: col_titles
 
     .. autoattribute:: cols
@@ -211,6 +762,8 @@ class Table(object):
 
     .. autoattribute:: data_iter
 
+    .. automethod:: iter_row_blocks
+
     .. attribute:: name
 
         The name of the table. This is intended for scripting usage and as such
@@ -219,12 +772,18 @@ class Table(object):
 
     .. autoattribute:: row_dims
 
+    .. autoattribute:: row_keys
+
+    .. autoattribute:: row_labels
+
     .. autoattribute:: row_titles
 
     .. autoattribute:: rows
 
     .. autoattribute:: rows_iter
 
+    .. automethod:: select
+
     .. attribute:: rows_title
 
         A string or tuple of strings giving the title of each row dimension.
@@ -244,11 +803,26 @@ class Table(object):
         The human readable title of the table, typically rendered in the web
         interface as the table's caption.
     """
+    __slots__ = (
+        'name', 'title', 'rows_title', 'rows_unit', 'cols_title', 'cols_unit',
+        '_rows', '_cols', '_row_dims', '_col_dims', '_func', '_data',
+        '_values', '_row_keys', '_col_keys', '_row_labels', '_col_labels',
+        '_row_spans', '_col_spans', '_row_index', '_col_index', '_chunks',
+        '_pending', '_source', '_lock',
+        )
+    # Slots which are merely caches of values derived from the others, or
+    # which (like the lock) are local to the process; none are pickled
+    _derived = frozenset((
+        '_row_keys', '_col_keys', '_row_labels', '_col_labels', '_row_spans',
+        '_col_spans', '_row_index', '_col_index', '_lock',
+        ))
+
     def __init__(
             self, name, rows, cols, func=None, data=None, title='',
-            rows_title=None, cols_title=None, rows_unit=None, cols_unit=None):
-        if func is None and data is None:
-            raise ValueError('Either func or data must be specified')
+            rows_title=None, cols_title=None, rows_unit=None, cols_unit=None,
+            values=None):
+        if func is None and data is None and values is None:
+            raise ValueError('One of func, data, or values must be specified')
         self._rows = tuple(rows)
         self._cols = tuple(cols)
         if not self._rows:
@@ -261,13 +835,48 @@ class Table(object):
         self.rows_unit = self._keys_default(rows_unit, self.row_dims)
         self.cols_title = self._keys_default(cols_title, self.col_dims)
         self.cols_unit = self._keys_default(cols_unit, self.col_dims)
-        self._row_spans = self._calculate_spans(tuple(self.rows_iter), self.row_dims)
-        self._col_spans = self._calculate_spans(tuple(self.cols_iter), self.col_dims)
+        self._row_keys = None
+        self._col_keys = None
+        self._row_labels = None
+        self._col_labels = None
+        self._row_spans = None
+        self._col_spans = None
+        self._row_index = None
+        self._col_index = None
+        self._chunks = None
+        self._pending = None
+        self._source = None
+        self._lock = threading.Lock()
         self._func = func
         self._data = data
+        self._values = values
         self.name = name
         self.title = title
 
+    def __getstate__(self):
+        # A selection is stored as the values it selected rather than with the
+        # whole of the table it was selected from, and a partially calculated
+        # table is stored as its values rather than its chunks
+        if self._source is not None or self._chunks is not None:
+            self._evaluate()
+        # Once the values have been evaluated the data dict is also derived
+        return {
+            slot: getattr(self, slot)
+            for slot in self.__slots__
+            if slot not in self._derived
+            and not (slot == '_data' and self._values is not None)
+            }
+
+    def __setstate__(self, state):
+        for slot in self.__slots__:
+            setattr(self, slot, None)
+        self._lock = threading.Lock()
+        # Ignore derived values, e.g. from tables pickled by prior versions
+        # which stored their spans
+        for key, value in state.items():
+            if key in self.__slots__ and key not in self._derived:
+                setattr(self, key, value)
+
     def _keys_default(self, value, dims):
         if value is None:
             if dims == 1:
@@ -281,32 +890,6 @@ class Table(object):
                 raise ValueError('%r does not contain %dims elements' % (value, dims))
         return value
 
-    def _calculate_spans(self, keys, dims):
-        if not keys:
-            raise ValueError('keys cannot be empty')
-        if dims > 1:
-            spans = []
-            for dim in range(dims):
-                dim_spans = []
-                last_value = None
-                span = 0
-                for i, key in enumerate(keys):
-                    value = key[dim]
-                    if span == 0:
-                        for j, comparison in enumerate(keys[i:]):
-                            if comparison[dim] == key[dim]:
-                                span += 1
-                            else:
-                                break
-                        dim_spans.append(span)
-                    else:
-                        dim_spans.append(0)
-                    span -= 1
-                spans.append(dim_spans)
-            return {key: tuple(spans[d][i] for d in range(dims)) for i, key in enumerate(keys)}
-        else:
-            return {key: (1,) for key in keys}
-
     @property
     def rows(self):
         """
@@ -330,16 +913,42 @@ class Table(object):
         return self._row_dims
 
     @property
-    def rows_iter(self):
+    def row_keys(self):
         """
-        Returns an iterator over :attr:`rows` where each key is returned as a
-        tuple, regardless. This property is intended to make renderers simpler.
+        Returns :attr:`rows` as a sequence in which each key is a tuple,
+        regardless. The sequence is constructed once, when first required.
+        This property is intended to make renderers simpler.
         """
-        for row in self._rows:
-            if self.row_dims > 1:
-                yield row
+        if self._row_keys is None:
+            if self._row_dims > 1:
+                self._row_keys = self._rows
             else:
-                yield (row,)
+                self._row_keys = tuple((row,) for row in self._rows)
+        return self._row_keys
+
+    @property
+    def row_labels(self):
+        """
+        Returns a sequence parallel to :attr:`row_keys` containing the label
+        of each element of each key, as renderers should display it. Labels
+        are identical to the key elements, except that molecules are
+        represented by their SMILES notation. The sequence is constructed
+        once, when first required.
+        """
+        if self._row_labels is None:
+            self._row_labels = tuple(
+                tuple(_label(value) for value in key)
+                for key in self.row_keys
+                )
+        return self._row_labels
+
+    @property
+    def rows_iter(self):
+        """
+        Returns an iterator over :attr:`row_keys`. This property is intended
+        to make renderers simpler.
+        """
+        return iter(self.row_keys)
 
     @property
     def row_titles(self):
@@ -386,7 +995,17 @@ class Table(object):
         rows, and that the subsequent first elements within the spanned rows
         should not be rendered at all. This property is intended to make
         renderers that target human-readable formats simpler.
+
+        Spans are calculated when this property is first accessed, and are
+        stored as the starting index of each run of equal key elements.
+        Renderers working through the rows in order may find the
+        ``at(index)`` method of the mapping (which returns the spans of the
+        row at *index*) and the ``run(index, dim)`` method (which returns the
+        start and stop indexes of the span containing the row at *index* in
+        dimension *dim*) cheaper than looking up keys.
         """
+        if self._row_spans is None:
+            self._row_spans = _Spans(self.row_keys, self.row_dims)
         return self._row_spans
 
     @property
@@ -412,16 +1031,39 @@ class Table(object):
         return self._col_dims
 
     @property
-    def cols_iter(self):
+    def col_keys(self):
         """
-        Returns an iterator over :attr:`cols` where each key is returned as
-        a tuple, regardless.
+        Returns :attr:`cols` as a sequence in which each key is a tuple,
+        regardless. The sequence is constructed once, when first required.
+        This property is intended to make renderers simpler.
         """
-        for col in self._cols:
-            if self.col_dims > 1:
-                yield col
+        if self._col_keys is None:
+            if self._col_dims > 1:
+                self._col_keys = self._cols
             else:
-                yield (col,)
+                self._col_keys = tuple((col,) for col in self._cols)
+        return self._col_keys
+
+    @property
+    def col_labels(self):
+        """
+        Returns a sequence parallel to :attr:`col_keys` containing the label
+        of each element of each key. See :attr:`row_labels` for more
+        information.
+        """
+        if self._col_labels is None:
+            self._col_labels = tuple(
+                tuple(_label(value) for value in key)
+                for key in self.col_keys
+                )
+        return self._col_labels
+
+    @property
+    def cols_iter(self):
+        """
+        Returns an iterator over :attr:`col_keys`.
+        """
+        return iter(self.col_keys)
 
     @property
     def col_titles(self):
@@ -452,6 +1094,8 @@ class Table(object):
         of col spans. See :attr:`row_spans` for an example of the mapping
         returned.
         """
+        if self._col_spans is None:
+            self._col_spans = _Spans(self.col_keys, self.col_dims)
         return self._col_spans
 
     @property
@@ -463,14 +1107,251 @@ class Table(object):
         :attr:`cols` attributes.
         """
         if self._data is None:
+            values = self._evaluate()
+            if hasattr(values, 'tolist'):
+                values = values.tolist()
             self._data = {
-                (row, col): self._func(row, col)
-                for row in self.rows
-                for col in self.cols
+                (row, col): value
+                for row, row_values in zip(self.rows, values)
+                for col, value in zip(self.cols, row_values)
                 }
-            self._func = None
         return self._data
 
+    def _evaluate(self):
+        # Returns the table's values as a sequence of rows, each of which is a
+        # sequence of values in column order, calculating them if necessary
+        if self._values is None:
+            if self._source is not None or self._chunks is not None:
+                values = self._cells(
+                    range(len(self._rows)), range(len(self._cols)))
+                # A table which calculated its remaining cells has already
+                # collected its chunks as its values
+                if self._values is None:
+                    self._values = values
+                self._source = None
+            elif self._data is not None:
+                data = self._data
+                self._values = [
+                    [data[(row, col)] for col in self._cols]
+                    for row in self._rows
+                    ]
+            else:
+                func = self._func
+                cols = self._cols
+                context = EvaluationContext.current()
+                values = []
+                for row in self._rows:
+                    values.append([func(row, col) for col in cols])
+                    if context is not None:
+                        context._advance(len(cols))
+                self._values = values
+                self._func = None
+        return self._values
+
+    def _cells(self, row_indexes, col_indexes):
+        # Returns the values of the cells at the intersection of the rows and
+        # columns at the specified indexes as a list of rows, calculating only
+        # those cells which haven't been calculated before
+        if self._values is not None:
+            values = self._values
+            if hasattr(values, 'take'):
+                return values.take(list(row_indexes), axis=0).take(
+                    list(col_indexes), axis=1).tolist()
+            return [
+                [row_values[j] for j in col_indexes]
+                for row_values in (values[i] for i in row_indexes)
+                ]
+        if self._source is not None:
+            table, rows, cols = self._source
+            return table._cells(
+                [rows[i] for i in row_indexes],
+                [cols[j] for j in col_indexes])
+        rows = self._rows
+        cols = self._cols
+        if self._data is not None:
+            data = self._data
+            return [
+                [data[(row, cols[j])] for j in col_indexes]
+                for row in (rows[i] for i in row_indexes)
+                ]
+        # The chunks are shared by every thread reading the table, so their
+        # calculation (and collection as the table's values) is serialized
+        with self._lock:
+            if self._values is not None:
+                # Another thread calculated the last cells while we waited
+                return self._cells(row_indexes, col_indexes)
+            return self._calculate(row_indexes, col_indexes)
+
+    def _calculate(self, row_indexes, col_indexes):
+        # Calculates the cells of _cells which haven't been calculated before,
+        # storing them in chunks of rows until every cell is known. Must be
+        # called with the table's lock held
+        rows = self._rows
+        cols = self._cols
+        if self._chunks is None:
+            self._chunks = {}
+            self._pending = len(rows) * len(cols)
+        func = self._func
+        chunks = self._chunks
+        context = EvaluationContext.current()
+        all_cols = len(col_indexes) == len(cols) and (
+            list(col_indexes) == list(range(len(cols))))
+        result = []
+        for i in row_indexes:
+            chunk_index, offset = divmod(i, CHUNK_ROWS)
+            try:
+                chunk = chunks[chunk_index]
+            except KeyError:
+                chunk = chunks[chunk_index] = [None] * min(
+                    CHUNK_ROWS, len(rows) - chunk_index * CHUNK_ROWS)
+            row = rows[i]
+            row_values = chunk[offset]
+            pending = self._pending
+            if row_values is None and all_cols:
+                row_values = chunk[offset] = [func(row, col) for col in cols]
+                self._pending -= len(cols)
+                result.append(row_values)
+            else:
+                if row_values is None:
+                    row_values = chunk[offset] = [_PENDING] * len(cols)
+                values = []
+                for j in col_indexes:
+                    value = row_values[j]
+                    if value is _PENDING:
+                        value = row_values[j] = func(row, cols[j])
+                        self._pending -= 1
+                    values.append(value)
+                result.append(values)
+            if context is not None and self._pending < pending:
+                context._advance(pending - self._pending)
+        if not self._pending:
+            # Every cell has been calculated; collect the chunks as the
+            # table's values and discard the function
+            self._values = [
+                row_values
+                for chunk_index in range(len(chunks))
+                for row_values in chunks[chunk_index]
+                ]
+            self._chunks = None
+            self._pending = None
+            self._func = None
+        return result
+
+    def _indexes(self, keys, all_keys, index):
+        # Convert a selection of keys (None for all keys, a slice of positions,
+        # or a sequence of keys) to a list of positions within all_keys
+        if keys is None:
+            return list(range(len(all_keys)))
+        elif isinstance(keys, slice):
+            return list(range(*keys.indices(len(all_keys))))
+        else:
+            return [index[key] for key in keys]
+
+    @property
+    def _row_positions(self):
+        if self._row_index is None:
+            self._row_index = {}
+            for i, row in enumerate(self._rows):
+                self._row_index.setdefault(row, i)
+        return self._row_index
+
+    @property
+    def _col_positions(self):
+        if self._col_index is None:
+            self._col_index = {}
+            for i, col in enumerate(self._cols):
+                self._col_index.setdefault(col, i)
+        return self._col_index
+
+    def cell(self, row, col):
+        """
+        Returns the value of the cell with row key *row* and column key *col*
+        (keys are given as in :attr:`rows` and :attr:`cols`). Only that cell
+        is calculated, if it hasn't been already. Raises :exc:`KeyError` if
+        either key is not in the table.
+        """
+        return self._cells(
+            [self._row_positions[row]], [self._col_positions[col]])[0][0]
+
+    def select(self, rows=None, cols=None):
+        """
+        Returns a new :class:`Table` containing a portion of this table. The
+        *rows* and *cols* parameters may each be :data:`None` (the default) to
+        include all rows or columns, a :class:`slice` of the positions of the
+        rows or columns to include, or a sequence of keys (as in :attr:`rows`
+        and :attr:`cols`) in the order they should appear. For example::
+
+            first_page = table.select(rows=slice(0, 100))
+            some_cols = table.select(cols=['Formula', 'Weight'])
+
+        Nothing is calculated by this method; the new table calculates the
+        cells it requires from this table as they are accessed, so cells are
+        never calculated twice. Raises :exc:`KeyError` if a key is not in the
+        table, or :exc:`ValueError` if the selection is empty.
+        """
+        row_indexes = self._indexes(rows, self._rows, self._row_positions)
+        col_indexes = self._indexes(cols, self._cols, self._col_positions)
+        if not row_indexes:
+            raise ValueError('Selection must include at least one row')
+        if not col_indexes:
+            raise ValueError('Selection must include at least one column')
+        if self._values is None and self._source is not None:
+            # Select from the original table rather than building a chain of
+            # selections
+            source, source_rows, source_cols = self._source
+            source_rows = [source_rows[i] for i in row_indexes]
+            source_cols = [source_cols[j] for j in col_indexes]
+        else:
+            source, source_rows, source_cols = self, row_indexes, col_indexes
+        table = Table.__new__(Table)
+        table.__setstate__({
+            'name': self.name,
+            'title': self.title,
+            'rows_title': self.rows_title,
+            'rows_unit': self.rows_unit,
+            'cols_title': self.cols_title,
+            'cols_unit': self.cols_unit,
+            '_rows': tuple(self._rows[i] for i in row_indexes),
+            '_cols': tuple(self._cols[j] for j in col_indexes),
+            '_row_dims': self._row_dims,
+            '_col_dims': self._col_dims,
+            '_source': (source, source_rows, source_cols),
+            })
+        return table
+
+    def iter_row_blocks(self, n=1000, start=0, stop=None, labels=False):
+        """
+        Returns an iterator over the rows of the table from *start* up to (but
+        excluding) *stop* in blocks of up to *n* rows. Each block is a list of
+        (row_key, values) tuples in which *row_key* is the row's key as a
+        tuple (as in :attr:`row_keys`, or :attr:`row_labels` if *labels* is
+        :data:`True`) and *values* is a sequence of the row's values in the
+        order of :attr:`cols`. This is the cheapest means of retrieving values
+        in display order, and is intended for renderers. Only the rows
+        within the range are calculated, each block as it is reached.
+        """
+        keys = self.row_labels if labels else self.row_keys
+        if stop is None or stop > len(keys):
+            stop = len(keys)
+        # Tables built from a dict of data only calculate when they're
+        # entirely evaluated (which is cheap) in one go
+        if self._values is None and (
+                self._data is None or start > 0 or stop < len(keys)):
+            cols = range(len(self._cols))
+            for block_start in range(start, stop, n):
+                block_stop = min(block_start + n, stop)
+                yield list(zip(
+                    keys[block_start:block_stop],
+                    self._cells(range(block_start, block_stop), cols)))
+            return
+        values = self._evaluate()
+        for block_start in range(start, stop, n):
+            block_stop = min(block_start + n, stop)
+            block = values[block_start:block_stop]
+            if hasattr(block, 'tolist'):
+                block = block.tolist()
+            yield list(zip(keys[block_start:block_stop], block))
+
     @property
     def data_iter(self):
         """
@@ -480,9 +1361,11 @@ class Table(object):
         column dimensions. Furthermore, items are returned in declared row then
         column order. This property is intended to make renderers simpler.
         """
-        for row_tuple, row_key in zip(self.rows_iter, self.rows):
-            for col_tuple, col_key in zip(self.cols_iter, self.cols):
-                yield row_tuple, col_tuple, self.data[(row_key, col_key)]
+        col_keys = self.col_keys
+        for block in self.iter_row_blocks():
+            for row_tuple, values in block:
+                for col_tuple, value in zip(col_keys, values):
+                    yield row_tuple, col_tuple, value
 
     @property
     def as_ndarray(self):
@@ -502,11 +1385,7 @@ class Table(object):
         .. _numpy: http://www.numpy.org/
         """
         import numpy as np
-        return np.asarray(
-            [
-                [self.data[(row, col)] for col in self.cols]
-                for row in self.rows
-                ], dtype=np.float)
+        return np.asarray(self._evaluate(), dtype=float)
 
     @property
     def as_dataframe(self):
@@ -538,49 +1417,36 @@ class Table(object):
         return '<Table name="%s">' % self.name
 
     def __str__(self):
+        # Molecules are displayed by their labels rather than the raw keys,
+        # and values are retrieved in row-major order
+        col_labels = self.col_labels
+        rows = [
+            [str(head).strip() for head in label] +
+            [str(value).strip() for value in values]
+            for block in self.iter_row_blocks(labels=True)
+            for (label, values) in block
+            ]
         # Calculate maximum columns lengths. Firstly, row headers
-        if self.row_dims > 1:
-            max_col_lens = [
-                max(len(str(row[i]).strip()) for row in self.rows)
-                for i in range(self.row_dims)
-                ]
-        else:
-            max_col_lens = [
-                max(len(str(row).strip()) for row in self.rows)
-                ]
+        max_col_lens = [
+            max(len(row[i]) for row in rows)
+            for i in range(self.row_dims)
+            ]
         # then column headers and data...
-        if self.col_dims > 1:
-            max_col_lens.extend([
-                max(
-                    max(len(str(self.data[(row, col)]).strip()) for row in self.rows), # lengths of all col values
-                    *(len(str(header).strip()) for header in col) # length of col header(s)
-                    )
-                for col in self.cols
-                ])
-        else:
-            max_col_lens.extend([
-                max(
-                    max(len(str(self.data[(row, col)]).strip()) for row in self.rows),
-                    len(str(col).strip()),
-                    )
-                for col in self.cols
-                ])
+        max_col_lens.extend([
+            max(
+                max(len(row[self.row_dims + i]) for row in rows), # lengths of all col values
+                *(len(str(header).strip()) for header in col) # length of col header(s)
+                )
+            for i, col in enumerate(col_labels)
+            ])
 
         result = ''
         # Print the column headers
-        if self.col_dims > 1:
-            for i in range(self.col_dims):
-                result += ' | '.join(
-                    '%*s' % (max_col_len, str(col[i]))
-                    for max_col_len, col in zip(
-                        max_col_lens, (('',) * self.col_dims,) * self.row_dims + self.cols)
-                    )
-                result += '\n'
-        else:
+        for i in range(self.col_dims):
             result += ' | '.join(
-                '%*s' % (max_col_len, str(col))
+                '%*s' % (max_col_len, str(col[i]))
                 for max_col_len, col in zip(
-                    max_col_lens, ('',) * self.row_dims + self.cols)
+                    max_col_lens, (('',) * self.col_dims,) * self.row_dims + col_labels)
                 )
             result += '\n'
 
@@ -592,34 +1458,11 @@ class Table(object):
         result += '\n'
 
         # Print the data rows
-        for row in self.rows:
-            if self.row_dims > 1:
-                result += ' | '.join(
-                    '%*s' % (max_col_len, value)
-                    for max_col_len, value in zip(
-                        max_col_lens,
-                        [
-                            str(head).strip()
-                            for head in row
-                            ] +
-                        [
-                            str(self.data[(row, col)]).strip()
-                            for col in self.cols
-                            ]
-                        )
-                    )
-            else:
-                result += ' | '.join(
-                    '%*s' % (max_col_len, value)
-                    for max_col_len, value in zip(
-                        max_col_lens,
-                        [str(row).strip()] +
-                        [
-                            str(self.data[(row, col)]).strip()
-                            for col in self.cols
-                            ]
-                        )
-                    )
+        for row in rows:
+            result += ' | '.join(
+                '%*s' % (max_col_len, value)
+                for max_col_len, value in zip(max_col_lens, row)
+                )
             result += '\n'
         if sys.version_info.major < 3:
             return result.encode('utf-8')
@@ -30,8 +30,10 @@ from __future__ import (
     )
 str = type('')
 
-import pkgutil
-import json
+import time
+import hashlib
+import importlib
+from functools import partial
 from textwrap import dedent
 
 from flask import (
@@ -40,15 +42,27 @@ from flask import (
     url_for,
     render_template,
     make_response,
+    stream_with_context,
     send_file,
     jsonify,
     abort,
+    redirect,
+    session,
     )
+from flask.ext.wtf.csrf import generate_csrf
 import docutils.core
 
 from . import tools
 from . import renderers
 from . import forms
+from . import results
+from . import jsonio
+from . import limits
+from .store import ResultStore
+from .metrics import Metrics
+from .planner import Planner
+from .jobs import Job, JobRunner
+from .concurrency import ConcurrencyLimiter, Overloaded
 
 app = Flask(__name__)
 # maximum file upload is 1Mb
@@ -56,12 +70,52 @@ app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
 # equalto was only added in Jinja 2.8 ?!
 app.jinja_env.tests.setdefault('equalto', lambda value, other: value == other)
 
-tools = {
-    modname.split('.')[-1]: finder.find_module(modname).load_module(modname)
-    for (finder, modname, ispkg) in pkgutil.iter_modules(
-        tools.__path__, prefix=tools.__name__ + '.')
-    if not ispkg and modname != 'template'
-    }
+# Results rendered as HTML are retained for a while so that further pages of
+# rows can be fetched on demand
+result_store = ResultStore(ttl=600)
+
+# The number of rows of each table in a page of HTML output
+HTML_PAGE_ROWS = 100
+
+# The maximum number of seconds a request may spend calculating its result
+EVALUATION_TIMEOUT = 60
+
+# The limits on the resources a tool may use to calculate its result, keyed by
+# tool name; tools which aren't listed are subject to DEFAULT_LIMITS. Tools
+# with CPU or memory limits are run in a subprocess, which imports the tool's
+# module and this one to call the handler (see _handler)
+DEFAULT_LIMITS = limits.Limits(timeout=EVALUATION_TIMEOUT)
+TOOL_LIMITS = {}
+limits.preload(__name__)
+
+metrics = Metrics()
+
+# Tool calls are planned before they're executed: those which are cheap are run
+# immediately, those which are expensive are run in the background, and those
+# which are too expensive are rejected. Background jobs are subject to the
+# tool's limits apart from the timeout, which is BACKGROUND_TIMEOUT instead
+planner = Planner()
+jobs = JobRunner()
+BACKGROUND_TIMEOUT = 1800
+
+# The number of seconds after which clients should retry a call rejected for
+# lack of capacity, or check on the progress of a background job
+RETRY_AFTER = 5
+JOB_POLL_INTERVAL = 1
+
+# Tool calls executed in the foreground are limited to MAX_ACTIVE_CALLS at
+# once, and to the limit in TOOL_CONCURRENCY (keyed by tool name) for
+# particular tools. Up to MAX_QUEUED_CALLS further calls wait for up to
+# MAX_QUEUE_WAIT seconds to execute; beyond that calls are rejected
+MAX_ACTIVE_CALLS = 8
+MAX_QUEUED_CALLS = 32
+MAX_QUEUE_WAIT = 10
+TOOL_CONCURRENCY = {}
+limiter = ConcurrencyLimiter(
+    MAX_ACTIVE_CALLS, MAX_QUEUED_CALLS, MAX_QUEUE_WAIT, TOOL_CONCURRENCY,
+    metrics)
+
+tools = tools.modules()
 
 
 @app.route('/')
@@ -92,15 +146,25 @@ def api():
                 'title': (mod.__doc__ or '').strip(),
                 'doc': dedent(mod.handler.__doc__ or ''),
                 'params': [
-                    field.name for field in mod.HandlerForm()
+                    field.name for field in form
                     if field.name not in ('csrf_token', 'output_format')
                     ],
+                # The maximum length of each compound list parameter; this
+                # permits clients to split longer lists over several calls
+                'lists': {
+                    field.name: field.form.entry.max_entries
+                    for field in form
+                    if isinstance(field, forms.SMILESListField)
+                    },
                 }
             for mod_name, mod in tools.items()
+            for form in (mod.HandlerForm(),)
             })
         # Simple CORS setup
         response.headers['Access-Control-Allow-Origin'] = '*'
-        return response
+        # Permit clients to revalidate their stored copy of the manifest
+        response.add_etag()
+        return response.make_conditional(request)
     else:
         abort(406)
 
@@ -135,6 +199,7 @@ def api_docs(name):
 def call(name):
     # Ensure CORS is on for all responses, including errors
     headers = {'Access-Control-Allow-Origin': '*'}
+    mimetype = 'application/json'
     # Fail if the RPC call has more than a meg of data
     if request.content_length > 1048576:
         result = jsonify(exc_type='ValueError', exc_value='Request too large')
@@ -147,7 +212,7 @@ def call(name):
             status = 404
         else:
             try:
-                args = json.loads(request.get_data(cache=False, as_text=True))
+                args = jsonio.loads(request.get_data(cache=False))
                 args = forms.convert_args(mod.HandlerForm(formdata=None), args)
             except ValueError as e:
                 result = jsonify(exc_type='ValueError', exc_value='Badly formed parameters: %s' % str(e))
@@ -156,20 +221,323 @@ def call(name):
                 result = jsonify(exc_type='KeyError', exc_value='Missing parameter: %s' % str(e))
                 status = 400
             else:
-                try:
-                    result = mod.handler(**args)
-                except (ValueError, KeyError) as e:
-                    result = jsonify(exc_type=e.__class__.__name__, exc_value=str(e))
-                    status = 400
+                # Clients which understand the binary format ask for it
+                # explicitly; everyone else gets JSON
+                result_mimetype = request.accept_mimetypes.best_match([
+                    'application/json',
+                    results._BINARY_MIMETYPE,
+                    ], default='application/json')
+                plan = _plan(name, mod, args)
+                if plan.action == 'reject':
+                    result = jsonify(exc_type='ValueError', exc_value=plan.reason)
+                    status = plan.status
+                    if status == 503:
+                        headers['Retry-After'] = str(RETRY_AFTER)
+                elif plan.action == 'background':
+                    try:
+                        job = _submit(name, mod, args, result_mimetype, plan)
+                    except Overloaded as e:
+                        result = jsonify(exc_type='RuntimeError', exc_value=str(e))
+                        status = 503
+                        headers['Retry-After'] = str(RETRY_AFTER)
+                    else:
+                        result = jsonify(**job.as_dict())
+                        status = 202
+                        headers['Location'] = url_for('job', job_id=job.id)
+                        headers['Retry-After'] = str(JOB_POLL_INTERVAL)
                 else:
-                    headers, result = renderers.render('application/json', result)
-                    status = 200
+                    try:
+                        with limiter.slot(name):
+                            # Tables are calculated as they're rendered so
+                            # the limits must cover both steps
+                            start = time.time()
+                            result_headers, result, cells = _limited(
+                                name, _call_render,
+                                (mod.__name__, args, result_mimetype))
+                            planner.record(name, cells, time.time() - start)
+                    except Overloaded as e:
+                        result = jsonify(exc_type='RuntimeError', exc_value=str(e))
+                        status = 503
+                        headers['Retry-After'] = str(RETRY_AFTER)
+                    except (
+                            ValueError, KeyError, results.Cancelled,
+                            limits.TimeLimitExceeded) as e:
+                        result, status = _call_error(e)
+                    else:
+                        headers = result_headers
+                        mimetype = result_mimetype
+                        status = 200
     response = make_response(result)
-    response.mimetype = 'application/json'
+    response.mimetype = mimetype
     response.headers.extend(headers)
     return response, status
 
 
+@app.route('/api/<name>/explain', methods=['POST'])
+def explain(name):
+    # Return the plan for a call without executing it; the parameters are
+    # the same as for the call itself
+    try:
+        mod = tools[name]
+    except KeyError:
+        result = jsonify(exc_type='NameError', exc_value='Unknown method')
+        status = 404
+    else:
+        try:
+            args = jsonio.loads(request.get_data(cache=False))
+            args = forms.convert_args(mod.HandlerForm(formdata=None), args)
+        except ValueError as e:
+            result = jsonify(exc_type='ValueError', exc_value='Badly formed parameters: %s' % str(e))
+            status = 400
+        except KeyError as e:
+            result = jsonify(exc_type='KeyError', exc_value='Missing parameter: %s' % str(e))
+            status = 400
+        else:
+            result = jsonify(**planner.plan(
+                name, mod, args, background=jobs.available).as_dict())
+            status = 200
+    result.headers['Access-Control-Allow-Origin'] = '*'
+    return result, status
+
+
+def _call_error(e):
+    # Convert an exception raised by a tool call to a JSON error response and
+    # its status
+    if isinstance(e, limits.TimeLimitExceeded):
+        # Not 503 or 504: clients retry those, and the call would only
+        # exceed its limit again
+        return jsonify(exc_type='TimeoutError', exc_value=str(e)), 422
+    elif isinstance(e, limits.MemoryLimitExceeded):
+        return jsonify(exc_type='ValueError', exc_value=str(e)), 400
+    elif isinstance(e, (ValueError, KeyError)):
+        return jsonify(exc_type=e.__class__.__name__, exc_value=str(e)), 400
+    elif isinstance(e, results.Cancelled):
+        # Not 503: that would invite clients to retry a call which would
+        # simply be cancelled again
+        return jsonify(exc_type=e.__class__.__name__, exc_value=str(e)), 422
+    # Anything else is a failure of the tool itself, e.g. a background job
+    # which raised an unexpected exception
+    return jsonify(exc_type=e.__class__.__name__, exc_value=str(e)), 500
+
+
+def _handler(module):
+    # Tool handlers are passed to subprocesses by the name of their module
+    # rather than pickled (see umansysprop.limits)
+    return importlib.import_module(module).handler
+
+
+def _call_render(module, args, mimetype):
+    result = _handler(module)(**args)
+    headers, body = renderers.render(mimetype, result)
+    return headers, body, sum(len(table.rows) * len(table.cols) for table in result)
+
+
+def _plan(name, mod, args):
+    plan = planner.plan(name, mod, args, background=jobs.available)
+    metrics.inc(
+        'umansysprop_admissions_total', tool=name, action=plan.action,
+        help='Tool calls by the action chosen by the planner')
+    return plan
+
+
+def _submit(name, mod, args, mimetype, plan):
+    # Submit the tool call as a background job, returning the job. The plan
+    # only found capacity for the job; other requests may have taken it
+    # since, in which case the call is shed like one the limiter turns away
+    try:
+        return jobs.submit(Job(
+            name, _background, (name, mod.__name__, args), mimetype,
+            mod.__doc__, plan.cells))
+    except ValueError as e:
+        metrics.inc(
+            'umansysprop_calls_shed_total', tool=name, reason='jobs',
+            help='Tool calls rejected because the server was overloaded')
+        raise Overloaded('jobs', str(e))
+
+
+def _background(name, module, args):
+    # Executed by a job's thread: calculate the entire result subject to the
+    # tool's limits, with the longer timeout for background jobs. The result
+    # is retained in the result store (which bounds the memory used by all
+    # retained results) and the job only holds its handle
+    start = time.time()
+    result = _limited(
+        name, _tool_result, (module, args), timeout=BACKGROUND_TIMEOUT)
+    planner.record(
+        name, sum(len(table.rows) * len(table.cols) for table in result),
+        time.time() - start)
+    return result_store.add(result, name)
+
+
+def _count_breach(name, limit):
+    metrics.inc(
+        'umansysprop_limit_breaches_total', tool=name, limit=limit,
+        help='Tool calls which exceeded their resource limits')
+
+
+def _limited(name, func, args, timeout=None):
+    # Call func with args subject to the limits of the named tool (with the
+    # timeout overridden if specified), in a subprocess if required. Breaches
+    # of the limits are counted, and a breached deadline always raises
+    # TimeLimitExceeded
+    tool_limits = TOOL_LIMITS.get(name, DEFAULT_LIMITS)
+    if timeout is not None:
+        tool_limits = tool_limits._replace(timeout=timeout)
+    try:
+        if tool_limits.isolated:
+            return limits.run(tool_limits, func, *args)
+        with results.EvaluationContext(timeout=tool_limits.timeout):
+            return func(*args)
+    except results.DeadlineExceeded as e:
+        _count_breach(name, 'timeout')
+        raise limits.TimeLimitExceeded('timeout', str(e))
+    except (limits.TimeLimitExceeded, limits.MemoryLimitExceeded) as e:
+        _count_breach(name, e.limit)
+        raise
+
+
+def _tool_result(module, args):
+    return limits.evaluated(_handler(module)(**args))
+
+
+# Cache of rendered tool input pages. A tool's page is identical for every GET
+# apart from the CSRF token, so it is rendered once and stored as the list of
+# fragments either side of the token along with an ETag for the fragments
+_tool_pages = {}
+
+
+def _csrf_epoch():
+    # Clients revalidating a cached page with its ETag will re-use the CSRF
+    # token they were given originally. Rotate the ETag at half the token's
+    # lifetime so that re-used tokens are always still valid
+    limit = app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if not limit:
+        return 0
+    return int(time.time() // max(1, limit // 2))
+
+
+def _csrf_session():
+    # The token embedded in a page is derived from a secret held in the
+    # session. A hash of that secret is mixed into the page's ETag so that a
+    # client with a different (or new) session never revalidates a page
+    # carrying another session's token
+    secret = session.get(app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+    if not secret:
+        return ''
+    return hashlib.sha1(str(secret).encode('utf-8')).hexdigest()[:16]
+
+
+def _tool_page(name, mod):
+    try:
+        parts, etag = _tool_pages[name]
+        token = generate_csrf() if len(parts) > 1 else ''
+    except KeyError:
+        form = mod.HandlerForm()
+        page = render_template(
+            '%s.html' % name,
+            title=mod.__doc__,
+            form=form,
+            )
+        try:
+            token = form.csrf_token.current_token
+        except AttributeError:
+            token = ''
+        parts = page.split(token) if token else [page]
+        etag = hashlib.sha1(''.join(parts).encode('utf-8')).hexdigest()
+        # Don't cache in debug mode so that template changes show up
+        if not app.debug:
+            _tool_pages[name] = (parts, etag)
+    if len(parts) > 1:
+        etag = '%s-%s-%d' % (etag, _csrf_session(), _csrf_epoch())
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(token.join(parts))
+    response.set_etag(etag, weak=True)
+    # The page contains a per-session token so it must never be stored by
+    # shared caches, and must be revalidated on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def _evaluate_stream(context, chunks):
+    # Generate the chunks of a streaming renderer within the evaluation
+    # context. If the client disconnects, the server closes this generator
+    # and the context is cancelled, abandoning any calculation in progress
+    try:
+        while True:
+            with context:
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+    except results.Cancelled:
+        # Too late to report an error; just truncate the response
+        return
+    finally:
+        context.cancel()
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _result_response(mimetype, result, title, handle=None, context=None,
+                     name=None):
+    # Render the result in the requested format within the evaluation context
+    # (a new one if none is given). If we're generating HTML for a retained
+    # result, render only the first page of rows and link to the result in
+    # other formats. HTML is always wrapped in a template. If name is given,
+    # breaches of the deadline are counted against that tool
+    if context is None:
+        context = results.EvaluationContext(timeout=EVALUATION_TIMEOUT)
+    try:
+        with context:
+            headers, result = _render_result(mimetype, result, title, handle)
+    except results.Cancelled as e:
+        if name is not None and isinstance(e, results.DeadlineExceeded):
+            _count_breach(name, 'timeout')
+        abort(_call_error(e)[1])
+    if isinstance(result, (str, bytes)):
+        response = make_response(result)
+    else:
+        # Streaming renderers return an iterable of chunks; keep the request
+        # context alive while the response is generated
+        response = app.response_class(stream_with_context(
+            _evaluate_stream(context, iter(result))))
+    response.mimetype = mimetype
+    response.headers.extend(headers)
+    return response
+
+
+def _render_result(mimetype, result, title, handle):
+    if mimetype == 'text/html':
+        if handle is None:
+            headers, result = renderers.render(mimetype, result)
+            formats = []
+        else:
+            headers, result = renderers.render(
+                mimetype, result, page_rows=HTML_PAGE_ROWS,
+                rows_url=lambda table, start: url_for(
+                    'result_rows', handle=handle, table=table.name,
+                    start=start))
+            formats = [
+                (format_mimetype, label)
+                for (format_mimetype, label) in renderers.registered()
+                if format_mimetype != mimetype
+                ]
+        result = render_template(
+            'result.html',
+            title=title,
+            result=result,
+            handle=handle,
+            formats=formats)
+    else:
+        headers, result = renderers.render(mimetype, result)
+    return headers, result
+
+
 @app.route('/tool/<name>', methods=['GET', 'POST'])
 def tool(name):
     # Present the tool's input form, or execute the tool's handler callable
@@ -178,22 +546,22 @@ def tool(name):
         mod = tools[name]
     except KeyError:
         abort(404)
+    if request.method == 'GET':
+        return _tool_page(name, mod)
     form = mod.HandlerForm(request.form)
     if form.validate_on_submit():
         args = form.data
         mimetype = args.pop('output_format')
-        result = mod.handler(**args)
-        headers, result = renderers.render(mimetype, result)
-        # If we're generating HTML, wrap the result in a template
-        if mimetype == 'text/html':
-            result = render_template(
-                'result.html',
-                title=mod.__doc__,
-                result=result)
-        response = make_response(result)
-        response.mimetype = mimetype
-        response.headers.extend(headers)
-        return response
+        plan = _plan(name, mod, args)
+        if plan.action == 'reject':
+            abort(plan.status)
+        if plan.action == 'background':
+            try:
+                job = _submit(name, mod, args, mimetype, plan)
+            except Overloaded as e:
+                abort(_overloaded(e))
+            return redirect(url_for('job', job_id=job.id), code=303)
+        return _admitted(name, _tool_call, name, mod, args, mimetype)
     return render_template(
         '%s.html' % name,
         title=mod.__doc__,
@@ -201,6 +569,194 @@ def tool(name):
         )
 
 
+def _overloaded(e):
+    # The response for a request from a browser which can't be admitted
+    return make_response(str(e), 503, {'Retry-After': str(RETRY_AFTER)})
+
+
+def _admitted(name, func, *args):
+    # Call func with args to produce a response while admitted to call the
+    # named tool. Streamed results are still being calculated after this
+    # returns, so the call remains admitted until the response is closed
+    try:
+        limiter.acquire(name)
+    except Overloaded as e:
+        abort(_overloaded(e))
+    try:
+        response = func(*args)
+    except:
+        limiter.release(name)
+        raise
+    response.call_on_close(partial(limiter.release, name))
+    return response
+
+
+def _tool_call(name, mod, args, mimetype):
+    # Execute the tool's handler subject to its limits and return the
+    # response for its result
+    tool_limits = TOOL_LIMITS.get(name, DEFAULT_LIMITS)
+    context = None
+    start = time.time()
+    try:
+        if tool_limits.isolated:
+            # The result must be fully calculated before it leaves the
+            # subprocess
+            result = _limited(name, _tool_result, (mod.__name__, args))
+            planner.record(
+                name, sum(len(table.rows) * len(table.cols) for table in result),
+                time.time() - start)
+        else:
+            # The handler's tables are calculated as the result is rendered,
+            # so that must happen within the same context
+            context = results.EvaluationContext(timeout=tool_limits.timeout)
+            with context:
+                result = mod.handler(**args)
+    except (limits.TimeLimitExceeded, limits.MemoryLimitExceeded) as e:
+        # Report errors with the same status as the JSON API
+        abort(_call_error(e)[1])
+    except results.Cancelled as e:
+        if isinstance(e, results.DeadlineExceeded):
+            _count_breach(name, 'timeout')
+        abort(_call_error(e)[1])
+    handle = None
+    if mimetype == 'text/html':
+        # Retain the result so that further pages of rows, and the result in
+        # other formats, can be fetched without recalculating it
+        try:
+            handle = result_store.add(result, name)
+        except ValueError:
+            # Too large to retain; render the result in full
+            pass
+    response = _result_response(
+        mimetype, result, mod.__doc__, handle, context, name)
+    if context is not None:
+        # The planner learns from the cells calculated as the result was
+        # rendered (only the first page of HTML output, for instance); a
+        # streamed result is still being calculated until it's closed
+        if response.is_streamed:
+            response.call_on_close(partial(_record, name, context, start))
+        else:
+            _record(name, context, start)
+    return response
+
+
+def _record(name, context, start):
+    planner.record(name, context.done, time.time() - start)
+
+
+@app.route('/result/<handle>', methods=['GET'])
+def result_download(handle):
+    # Render a retained result in another format; only the render step is
+    # repeated, the tool's handler is not re-run
+    try:
+        name, result = result_store.lookup(handle)
+    except KeyError:
+        abort(404)
+    mimetype = request.args.get('output_format', 'application/json')
+    if mimetype not in dict(renderers.registered()) or mimetype == 'text/html':
+        abort(406)
+    return _admitted(
+        name, _result_response, mimetype, result, None, None,
+        _stored_context(name), name)
+
+
+@app.route('/result/<handle>/<table>', methods=['GET'])
+def result_rows(handle, table):
+    # Render a further page of rows from a retained result
+    try:
+        name, result = result_store.lookup(handle)
+        table = [t for t in result if t.name == table][0]
+    except (KeyError, IndexError):
+        abort(404)
+    start = max(0, request.args.get('start', 0, type=int))
+    try:
+        with limiter.slot(name), _stored_context(name):
+            response = make_response(renderers.render_html_rows(
+                table, start, start + HTML_PAGE_ROWS,
+                rows_url=lambda table, start: url_for(
+                    'result_rows', handle=handle, table=table.name,
+                    start=start)))
+    except Overloaded as e:
+        abort(_overloaded(e))
+    except results.Cancelled as e:
+        if isinstance(e, results.DeadlineExceeded):
+            _count_breach(name, 'timeout')
+        abort(_call_error(e)[1])
+    response.mimetype = 'text/html'
+    return response
+
+
+def _stored_context(name):
+    # Cells of a retained result which weren't calculated when it was first
+    # rendered are calculated as it's rendered again, subject to the limits
+    # of the tool which produced it. Only the timeout applies: results of
+    # tools with CPU or memory limits are fully calculated in their
+    # subprocess (see _tool_result)
+    return results.EvaluationContext(
+        timeout=TOOL_LIMITS.get(name, DEFAULT_LIMITS).timeout)
+
+
+@app.route('/job/<job_id>', methods=['GET'])
+def job(job_id):
+    # Report the progress of a background job, or its result once complete
+    try:
+        job = jobs.get(job_id)
+    except KeyError:
+        return _job_missing('Unknown or expired job')
+    if job.state in ('pending', 'running'):
+        if job.mimetype == 'text/html':
+            response = make_response(render_template(
+                'job.html', title=job.title, job=job))
+        else:
+            response = jsonify(**job.as_dict())
+        response.status_code = 202
+        response.headers['Retry-After'] = str(JOB_POLL_INTERVAL)
+    elif job.state == 'failed':
+        if job.mimetype == 'text/html':
+            abort(_call_error(job.error)[1])
+        response, status = _call_error(job.error)
+        response.status_code = status
+    else:
+        # The result may have been discarded from the store to make room for
+        # others since the job finished
+        try:
+            result = result_store.get(job.result)
+        except KeyError:
+            return _job_missing('Result of job has expired', job.mimetype)
+        if job.mimetype == 'text/html':
+            response = _result_response(
+                job.mimetype, result, job.title, job.result)
+        else:
+            response = _result_response(job.mimetype, result, None)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+def _job_missing(message, mimetype=None):
+    # Browsers get the usual 404 page, while API clients (identified by the
+    # job's format, or the Accept header if the job is unknown) get the same
+    # JSON error as for an unknown method
+    if mimetype is None:
+        mimetype = request.accept_mimetypes.best_match([
+            'text/html',
+            'application/json',
+            ])
+    if mimetype == 'text/html':
+        abort(404)
+    response = jsonify(exc_type='NameError', exc_value=message)
+    response.status_code = 404
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_page():
+    response = make_response(metrics.render())
+    response.mimetype = 'text/plain'
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    return response
+
+
 def main():
     app.secret_key = 'testing'
     app.run(
@@ -0,0 +1,127 @@
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Short-lived server-side storage of calculated results, so that the web
+interface can fetch further portions of a result without recalculating it
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import uuid
+import time
+import threading
+from collections import OrderedDict
+
+
+class ResultStore(object):
+    """
+    A thread-safe store of recently calculated
+    :class:`~umansysprop.results.Result` instances, each of which is
+    identified by a randomly generated handle.
+
+    Results expire *ttl* seconds after they were last accessed. The memory
+    used by the store is bounded by *max_cells*, the total number of table
+    cells permitted across all retained results; when adding a result would
+    exceed this, the least recently used results are discarded. Note that the
+    store is local to the process; in a multi-process deployment a handle is
+    only valid in the process that created it.
+
+    Each result may be stored with the name of the tool which produced it, so
+    that any further calculation of its tables can be subject to that tool's
+    limits.
+    """
+
+    def __init__(self, ttl=600, max_cells=10000000):
+        self.ttl = ttl
+        self.max_cells = max_cells
+        self._lock = threading.Lock()
+        self._cells = 0
+        # Maps handle -> (expiry, cells, result, tool), ordered by expiry which
+        # is also least recently used order
+        self._results = OrderedDict()
+
+    @staticmethod
+    def _size(result):
+        return sum(len(table.rows) * len(table.cols) for table in result)
+
+    def _discard(self, handle):
+        expires, cells, result, tool = self._results.pop(handle)
+        self._cells -= cells
+
+    def _expire(self, now):
+        while self._results:
+            handle, (expires, cells, result, tool) = next(
+                iter(self._results.items()))
+            if expires > now:
+                break
+            self._discard(handle)
+
+    def add(self, result, tool=None):
+        """
+        Stores *result*, produced by the tool named *tool*, and returns the
+        handle which can be used to retrieve it with :meth:`get`. Raises
+        :exc:`ValueError` if *result* is too large to be stored at all.
+        """
+        cells = self._size(result)
+        if cells > self.max_cells:
+            raise ValueError(
+                'result has %d cells; maximum %d' % (cells, self.max_cells))
+        handle = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            while self._cells + cells > self.max_cells:
+                self._discard(next(iter(self._results)))
+            self._results[handle] = (now + self.ttl, cells, result, tool)
+            self._cells += cells
+        return handle
+
+    def get(self, handle):
+        """
+        Returns the result associated with *handle*, extending its lifetime.
+        Raises :exc:`KeyError` if *handle* is unknown or has expired.
+        """
+        return self.lookup(handle)[1]
+
+    def lookup(self, handle):
+        """
+        Returns a tuple of the name of the tool which produced the result
+        associated with *handle* (as given to :meth:`add`), and the result.
+        Like :meth:`get`, this extends the result's lifetime, and raises
+        :exc:`KeyError` if *handle* is unknown or has expired.
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            expires, cells, result, tool = self._results.pop(handle)
+            self._results[handle] = (now + self.ttl, cells, result, tool)
+        return tool, result
+
+    def __len__(self):
+        with self._lock:
+            self._expire(time.time())
+            return len(self._results)
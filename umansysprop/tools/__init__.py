@@ -1 +1,48 @@
-# Mark the directory as a Python module
+# vim: set et sw=4 sts=4 fileencoding=utf-8:
+#
+# Copyright 2014 Dave Jones <dave@waveform.org.uk>.
+#
+# This file is part of umansysprop.
+#
+# umansysprop is free software: you can redistribute it and/or modify it under
+# the terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 2 of the License, or (at your option) any later
+# version.
+#
+# umansysprop is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+# FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+# details.
+#
+# You should have received a copy of the GNU General Public License along with
+# umansysprop.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+The calculation tools provided by UManSysProp. Each module in this package
+defines a ``HandlerForm`` describing its parameters, and a ``handler``
+callable which performs the calculation
+"""
+
+from __future__ import (
+    unicode_literals,
+    absolute_import,
+    print_function,
+    division,
+    )
+str = type('')
+
+
+import pkgutil
+import importlib
+
+
+def modules():
+    """
+    Returns a dict mapping the name of each tool to its module.
+    """
+    return {
+        modname.split('.')[-1]: importlib.import_module(modname)
+        for (finder, modname, ispkg) in pkgutil.iter_modules(
+            __path__, prefix=__name__ + '.')
+        if not ispkg and modname != __name__ + '.template'
+        }
@@ -70,3 +70,9 @@ def handler(temperatures, scale1, scale2, compounds):
             )
         )
 
+
+def shapes(temperatures, scale1, scale2, compounds):
+    return {
+        'temps': (len(temperatures), 2),
+        'formulae': (len(compounds), 1),
+        }